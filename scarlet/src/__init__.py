@@ -5,7 +5,11 @@ Modulo 1: Foundation Setup
 This package contains the Scarlet agent implementation.
 """
 
-from .scarlet_agent import ScarletAgent, ScarletConfig, create_scarlet
+from .scarlet_agent import (
+    ScarletAgent, ScarletAgentPool, ScarletConfig, create_scarlet, collect_stream
+)
 
 __version__ = "0.1.0"
-__all__ = ["ScarletAgent", "ScarletConfig", "create_scarlet"]
+__all__ = [
+    "ScarletAgent", "ScarletAgentPool", "ScarletConfig", "create_scarlet", "collect_stream"
+]
@@ -13,7 +13,10 @@ Date: 2026-01-31
 
 import os
 import sys
+import time
 import hashlib
+import logging
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
@@ -26,6 +29,9 @@ sys.path.insert(0, str(Path(__file__).parent))
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "bge-m3")
 OLLAMA_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 EMBEDDING_CACHE_SIZE = 1000
+OLLAMA_PROBE_TTL = 30.0  # Seconds an Ollama availability check is reused
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -64,9 +70,11 @@ class EmbeddingManager:
         self.ollama_url = ollama_url
         self.use_cache = use_cache
         
-        # Cache for embeddings
-        self._cache: Dict[str, EmbeddingResult] = {}
-        self._cache_order: List[str] = []
+        # LRU cache for embeddings, keyed by full-text digest
+        self._cache: "OrderedDict[str, EmbeddingResult]" = OrderedDict()
+        
+        # Last Ollama availability check: (result, monotonic time)
+        self._ollama_probe: Optional[tuple] = None
         
         # Determine dimensions based on model
         self.dimensions = self._get_model_dimensions()
@@ -83,13 +91,20 @@ class EmbeddingManager:
         return model_dims.get(self.model, 1024)
     
     def is_ollama_available(self) -> bool:
-        """Check if Ollama is available for embeddings."""
+        """Check if Ollama is available for embeddings (cached for OLLAMA_PROBE_TTL)."""
+        probe = self._ollama_probe
+        now = time.monotonic()
+        if probe is not None and now - probe[1] < OLLAMA_PROBE_TTL:
+            return probe[0]
+        
         try:
             import httpx
             response = httpx.get(f"{OLLAMA_URL}/api/version", timeout=5.0)
-            return response.status_code == 200
+            available = response.status_code == 200
         except Exception:
-            return False
+            available = False
+        self._ollama_probe = (available, now)
+        return available
     
     def _get_text_hash(self, text: str) -> str:
         """Get deterministic hash for text."""
@@ -136,14 +151,14 @@ class EmbeddingManager:
         Returns:
             EmbeddingResult with vector and metadata
         """
-        import time
         start_time = time.time()
         
         dims = dimensions or self.dimensions
         
-        # Check cache
-        cache_key = f"{text[:100]}:{dims}"
+        # Check cache (full-text digest: texts sharing a prefix must not collide)
+        cache_key = f"{self._get_text_hash(text)}:{dims}"
         if self.use_cache and cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
             result = self._cache[cache_key]
             result.cached = True
             result.generation_time_ms = (time.time() - start_time) * 1000
@@ -161,7 +176,8 @@ class EmbeddingManager:
                     generation_time_ms=(time.time() - start_time) * 1000,
                 )
             except Exception as e:
-                print(f"[EmbeddingManager] Ollama failed: {e}, using fallback")
+                logger.warning("[EmbeddingManager] Ollama failed: %s, using fallback", e)
+                self._ollama_probe = None
                 vector = self._get_deterministic_embedding(text, dims)
                 result = EmbeddingResult(
                     vector=vector,
@@ -192,13 +208,10 @@ class EmbeddingManager:
         # Add to cache
         if self.use_cache:
             self._cache[cache_key] = result
-            self._cache_order.append(cache_key)
             
             # LRU eviction
-            while len(self._cache_order) > EMBEDDING_CACHE_SIZE:
-                old_key = self._cache_order.pop(0)
-                if old_key in self._cache:
-                    del self._cache[old_key]
+            while len(self._cache) > EMBEDDING_CACHE_SIZE:
+                self._cache.popitem(last=False)
         
         return result
     
@@ -284,7 +297,6 @@ class EmbeddingManager:
     def clear_cache(self):
         """Clear the embedding cache."""
         self._cache.clear()
-        self._cache_order.clear()
     
     def __del__(self):
         """Cleanup on deletion."""
@@ -15,6 +15,7 @@ import os
 import sys
 import json
 import uuid
+import logging
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass, field
@@ -28,6 +29,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from memory.qdrant_manager import QdrantManager, CollectionType, get_manager
 from qdrant_client.models import PointStruct
 
+logger = logging.getLogger(__name__)
+
 
 class MemoryType(Enum):
     """Types of memory for Scarlet"""
@@ -261,7 +264,7 @@ class MemoryManager:
                 from memory.embedding_manager import EmbeddingManager
                 self.embedding = EmbeddingManager()
             except ImportError:
-                print("[MemoryManager] Warning: EmbeddingManager not available")
+                logger.warning("[MemoryManager] EmbeddingManager not available")
         
     def connect_qdrant(self) -> bool:
         """Ensure Qdrant is connected."""
@@ -305,30 +308,71 @@ class MemoryManager:
             return True
             
         except Exception as e:
-            print(f"[MemoryManager] Error storing memory: {e}")
+            logger.error("[MemoryManager] Error storing memory: %s", e)
             return False
     
-    def _store_in_qdrant(self, memory: MemoryBlock):
-        """Store memory as vector in Qdrant."""
-        collection_type = self._get_collection_for_memory(memory.memory_type)
+    def store_memories(self, memories: List[MemoryBlock]) -> Dict[str, int]:
+        """
+        Store several memory blocks in Qdrant with one upsert per collection.
         
-        # Generate embedding text
-        embedding_text = memory.embedding_text or f"{memory.title}: {memory.content}"
+        Args:
+            memories: Memories to store (any mix of types)
+            
+        Returns:
+            Number of memories stored per memory type ("episodic", ...);
+            a type whose upsert failed counts 0
+        """
+        by_collection: Dict[CollectionType, List[MemoryBlock]] = {}
+        for memory in memories:
+            collection_type = self._get_collection_for_memory(memory.memory_type)
+            by_collection.setdefault(collection_type, []).append(memory)
         
-        # Generate vector using embedding manager
-        vector = []
-        if self.embedding:
-            try:
-                # Get expected dimensions from collection config
-                from memory.qdrant_manager import COLLECTION_CONFIGS
-                dims = COLLECTION_CONFIGS[collection_type].vector_size
-                embedding_result = self.embedding.generate(embedding_text, dimensions=dims)
-                vector = embedding_result.vector
-            except Exception as e:
-                print(f"[MemoryManager] Embedding generation failed: {e}")
+        stored: Dict[str, int] = {}
+        for collection_type, batch in by_collection.items():
+            vectors = self._embed_batch(collection_type, batch)
+            points = [
+                self._build_point(memory, vector)
+                for memory, vector in zip(batch, vectors)
+            ]
+            ok = self.qdrant.upsert_points(collection_type, points)
+            for memory in batch:
+                key = memory.memory_type.value
+                stored[key] = stored.get(key, 0) + (1 if ok else 0)
+                if ok:
+                    self._memory_cache[memory.id] = memory
         
-        # Create point
-        point = PointStruct(
+        return stored
+    
+    def _embed_batch(
+        self,
+        collection_type: CollectionType,
+        memories: List[MemoryBlock],
+    ) -> List[List[float]]:
+        """Generate vectors for memories going to the same collection."""
+        if not self.embedding:
+            return [[] for _ in memories]
+        
+        texts = [
+            memory.embedding_text or f"{memory.title}: {memory.content}"
+            for memory in memories
+        ]
+        try:
+            from memory.qdrant_manager import COLLECTION_CONFIGS
+            dims = COLLECTION_CONFIGS[collection_type].vector_size
+            return [r.vector for r in self.embedding.generate_batch(texts, dimensions=dims)]
+        except Exception as e:
+            logger.warning("[MemoryManager] Embedding generation failed: %s", e)
+            return [[] for _ in memories]
+    
+    def _store_in_qdrant(self, memory: MemoryBlock):
+        """Store memory as vector in Qdrant."""
+        collection_type = self._get_collection_for_memory(memory.memory_type)
+        vector = self._embed_batch(collection_type, [memory])[0]
+        self.qdrant.upsert_points(collection_type, [self._build_point(memory, vector)])
+    
+    def _build_point(self, memory: MemoryBlock, vector: List[float]) -> PointStruct:
+        """Build the Qdrant point for a memory."""
+        return PointStruct(
             id=memory.id,
             vector=vector,
             payload={
@@ -342,8 +386,6 @@ class MemoryManager:
                 "metadata": json.dumps(memory.metadata),
             }
         )
-        
-        self.qdrant.upsert_points(collection_type, [point])
     
     def _store_in_letta(self, memory: MemoryBlock, agent_id: str):
         """Store memory summary in Letta memory block."""
@@ -370,7 +412,7 @@ class MemoryManager:
                     value=new_value
                 )
         except Exception as e:
-            print(f"[MemoryManager] Warning: Could not update Letta block: {e}")
+            logger.warning("[MemoryManager] Could not update Letta block: %s", e)
     
     def _get_collection_for_memory(self, memory_type: MemoryType) -> CollectionType:
         """Get Qdrant collection for memory type."""
@@ -428,7 +470,7 @@ class MemoryManager:
                     embedding_result = self.embedding.generate(query, dimensions=dims)
                     query_vector = embedding_result.vector
                 except Exception as e:
-                    print(f"[MemoryManager] Query embedding failed: {e}")
+                    logger.warning("[MemoryManager] Query embedding failed: %s", e)
             
             qdrant_results = self.qdrant.search(
                 collection,
@@ -598,7 +640,7 @@ class MemoryManager:
             self._memory_cache.clear()
             return True
         except Exception as e:
-            print(f"[MemoryManager] Error clearing memories: {e}")
+            logger.error("[MemoryManager] Error clearing memories: %s", e)
             return False
 
 
@@ -18,6 +18,7 @@ import os
 import sys
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Union, Tuple
 from dataclasses import dataclass, field
@@ -320,17 +321,27 @@ class MemoryRetriever:
         collections = list(set(collections))  # Unique
         metadata["collections_searched"] = collections
         
-        for collection in collections:
+        # Collections are independent: query them concurrently so the step
+        # costs one Qdrant round-trip instead of one per collection
+        def search(collection: str) -> List[RetrievalResult]:
             try:
-                results = self._search_collection_filtered(
+                return self._search_collection_filtered(
                     collection=collection,
                     query_vector=query_vector,
                     qdrant_filter=qdrant_filter,
                     limit=limit * 2,
                 )
-                all_results.extend(results)
             except Exception as e:
                 logger.warning(f"[smart_search] Search failed for {collection}: {e}")
+                return []
+        
+        if len(collections) > 1:
+            with ThreadPoolExecutor(max_workers=len(collections), thread_name_prefix="retriever-search") as pool:
+                for results in pool.map(search, collections):
+                    all_results.extend(results)
+        else:
+            for collection in collections:
+                all_results.extend(search(collection))
         
         metadata["total_candidates"] = len(all_results)
         
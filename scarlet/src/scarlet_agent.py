@@ -12,27 +12,111 @@ Architecture:
 - SleepTimeOrchestrator: Coordinates sleep-time cycles
 """
 
+import asyncio
+import copy
+import hashlib
+import io
 import os
 import sys
 import json
+import logging
+import operator
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Callable
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Callable, Sequence, Tuple
 from dataclasses import dataclass, field
-from dotenv import load_dotenv
 from datetime import datetime
 
-# Add parent directory to path for imports
+# Optional: Letta SDK error base class, so only transport/API failures
+# are rewrapped as RuntimeError (programming errors propagate unchanged)
+try:
+    from letta_client import APIError as LettaAPIError
+    _LETTA_ERRORS = (LettaAPIError, ConnectionError, TimeoutError)
+except ImportError:
+    _LETTA_ERRORS = (ConnectionError, TimeoutError)
+
+# Add parent directories to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# Load environment variables
-load_dotenv(Path(__file__).parent.parent / ".env")
+# Optional orjson/h2, detected once (see speedups.py)
+from speedups import HTTP2_AVAILABLE, json_dumps as _json_dumps, json_loads as _json_loads
+
+logger = logging.getLogger(__name__)
+
+# .env is read on first agent construction rather than at import time
+_ENV_LOADED = False
+
+
+def _ensure_env():
+    """Load scarlet/.env into the environment once per process."""
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    _ENV_LOADED = True
+
+# Letta clients shared across agents, keyed by (base_url, api_key), so
+# every ScarletAgent talking to the same server reuses one HTTP pool
+_CLIENT_CACHE: Dict[Tuple[str, str], Any] = {}
+_CLIENT_LOCK = threading.Lock()
+
+# One keep-alive connection pool backs every Letta client (primary and
+# sleep-time agents alike), created lazily and closed at interpreter exit.
+# Sized for many agents per process plus parallel memory block writes.
+_HTTP_POOL = None
+_HTTP_POOL_LIMITS = {"max_keepalive_connections": 20, "max_connections": 100}
+_HTTP_POOL_TIMEOUT = 60.0
+
+
+def _get_http_pool():
+    """Return the shared httpx.Client (caller must hold _CLIENT_LOCK)."""
+    global _HTTP_POOL
+    if _HTTP_POOL is None:
+        import atexit
+        import httpx
+        _HTTP_POOL = httpx.Client(
+            limits=httpx.Limits(**_HTTP_POOL_LIMITS),
+            timeout=_HTTP_POOL_TIMEOUT,
+            http2=HTTP2_AVAILABLE,
+        )
+        atexit.register(_HTTP_POOL.close)
+    return _HTTP_POOL
+
+
+# Prompt file text by path, with the mtime it was read at, shared by all
+# agents so repeated create() calls (pools, respawns) only stat the file
+_PROMPT_CACHE: Dict[str, Tuple[int, str]] = {}
+
+
+def _read_prompt(prompt_path: Path, what: str) -> str:
+    """Read a prompt file, re-reading only when its mtime changes."""
+    try:
+        mtime = prompt_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{what} not found: {prompt_path}") from None
+    key = str(prompt_path)
+    cached = _PROMPT_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    text = prompt_path.read_text(encoding='utf-8')
+    _PROMPT_CACHE[key] = (mtime, text)
+    return text
 
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ScarletConfig:
     """Configuration for Scarlet agent."""
     name: str = "Scarlet"
@@ -45,42 +129,277 @@ class ScarletConfig:
     # Sleep-time configuration
     sleep_messages_threshold: int = 5  # Trigger after N messages
     sleep_enabled: bool = True  # Enable custom sleep-time system
+    sleep_state_path: Optional[str] = None  # Persist orchestrator state across restarts
+    consolidation_history_cap: Optional[int] = None  # Records kept (None = orchestrator default)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SleepAgentConfig:
     """Configuration for custom sleep-time agent."""
     name: str = "Scarlet-Sleep"
     model: str = "minimax/MiniMax-M2.1"  # Can use different model
     description: str = "Agente per consolidamento memoria di Scarlet"
+    # Semantic cache: reuse insights for near-identical histories
+    cache_similarity: float = 0.9  # Min cosine similarity for a cache hit
+    cache_size: int = 256  # Cached histories (0 disables the cache)
+    # History sent per cycle is capped to its most recent characters
+    max_history_chars: int = 8000  # 0 disables the cap
+    # Skip the LLM when the lines new since the last cycle are this short
+    min_new_words: int = 20  # 0 disables the guard
+    # Stream the reply and stop reading once the JSON object is complete
+    stream_response: bool = False
+
+
+# =============================================================================
+# RESPONSE HELPERS
+# =============================================================================
+
+def _reply_text(response) -> Optional[str]:
+    """
+    Return the text of the first message in a Letta response.
+    
+    Reads ``content`` and falls back to ``assistant_message``. Each field
+    is looked up once; returns None when the response carries no text.
+    """
+    messages = getattr(response, 'messages', None)
+    if not messages:
+        return None
+    msg = messages[0]
+    return getattr(msg, 'content', None) or getattr(msg, 'assistant_message', None) or None
+
+
+def _read_json_stream(stream) -> str:
+    """
+    Collect assistant text from a Letta stream up to the first full JSON object.
+    
+    Tracks brace depth outside string literals and closes the stream as
+    soon as the top-level object ends, so trailing tokens are never waited
+    for. Returns whatever text arrived if the object never closes.
+    """
+    buf = io.StringIO()
+    depth = 0
+    in_string = False
+    escaped = False
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'message_type', None) != "assistant_message":
+                continue
+            text = getattr(chunk, 'content', None)
+            if not isinstance(text, str) or not text:
+                continue
+            for i, ch in enumerate(text):
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif ch == "\\":
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"':
+                    in_string = depth > 0
+                elif ch == "{":
+                    depth += 1
+                elif ch == "}" and depth > 0:
+                    depth -= 1
+                    if depth == 0:
+                        buf.write(text[:i + 1])
+                        return buf.getvalue()
+            buf.write(text)
+        return buf.getvalue()
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+
+def _strip_thinking(text: str) -> str:
+    """
+    Drop a leading thinking block (everything up to the last 'Thinking:').
+    
+    Single rpartition scan; text without the marker is returned as-is.
+    """
+    _, sep, tail = text.rpartition('Thinking:')
+    return tail.strip() if sep else text
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    """Scale a vector to unit length (zero vectors are returned as-is)."""
+    magnitude = sum(v * v for v in vector) ** 0.5
+    if magnitude == 0:
+        return vector
+    return [v / magnitude for v in vector]
+
+
+# Template for results with no updates. Empty tuples are immutable, so
+# every copy can share them; only the nested counter dict is per-copy.
+_EMPTY_INSIGHTS: Dict[str, Any] = {
+    "persona_updates": (),
+    "human_updates": (),
+    "goals_insights": (),
+    "key_events": (),
+    "knowledge_updates": (),
+    "skill_updates": (),
+    "emotional_patterns": (),
+    "reflection": "",
+    "priority_actions": (),
+    "priority_score": 0.3,
+}
+_EMPTY_MEMORIES_STORED = {"episodic": 0, "knowledge": 0, "skills": 0, "emotional": 0}
+
+
+def _empty_insights(reflection: str, priority_score: float = 0.3) -> Dict[str, Any]:
+    """Build an insights dict with no updates (fallbacks and skipped cycles)."""
+    insights = _EMPTY_INSIGHTS.copy()
+    insights["reflection"] = reflection
+    insights["priority_score"] = priority_score
+    insights["memories_stored"] = _EMPTY_MEMORIES_STORED.copy()
+    return insights
+
+
+def _tail_history(text: str, max_chars: int) -> str:
+    """
+    Keep the last ``max_chars`` of a history, cut on a line boundary.
+    
+    Older lines are dropped so a long session cannot grow the prompt
+    without bound; returns the text unchanged when it already fits.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    cutoff = len(text) - max_chars
+    newline = text.find("\n", cutoff - 1)
+    start = newline + 1 if newline != -1 else cutoff
+    return text[start:]
+
+
+class _SemanticCache:
+    """
+    Bounded cache of consolidation insights keyed by history embedding.
+    
+    A lookup returns the insights of the most similar cached history when
+    its cosine similarity reaches the threshold. Vectors are stored
+    normalized, so similarity is a plain dot product. The least recently
+    used entry is evicted when the cache is full.
+    """
+    
+    __slots__ = ("threshold", "_entries")
+    
+    def __init__(self, threshold: float = 0.9, maxlen: int = 256):
+        self.threshold = threshold
+        self._entries: deque = deque(maxlen=maxlen)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def lookup(self, vector: List[float]) -> Optional[Dict[str, Any]]:
+        """Return cached insights for a normalized vector, or None."""
+        best_index, best_score = None, self.threshold
+        for i, (cached_vector, _) in enumerate(self._entries):
+            score = sum(map(operator.mul, vector, cached_vector))
+            if score >= best_score:
+                best_index, best_score = i, score
+        
+        if best_index is None:
+            return None
+        
+        # Refresh recency of the hit
+        entry = self._entries[best_index]
+        del self._entries[best_index]
+        self._entries.append(entry)
+        return entry[1]
+    
+    def add(self, vector: List[float], insights: Dict[str, Any]):
+        """Store insights under a normalized vector."""
+        self._entries.append((vector, insights))
 
 
 # =============================================================================
 # SLEEP-TIME AGENT
 # =============================================================================
 
+# Parsed sleep-agent responses keyed by blake2b digest of the raw text (LRU)
+_PARSED_CACHE: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+_PARSED_CACHE_MAX = 128
+_PARSED_CACHE_LOCK = threading.Lock()
+
+# Outermost JSON object: first '{' through last '}' (fences fall outside)
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+# Per-call consolidation message. The instructions and full JSON schema
+# live in the sleep agent's system prompt (prompts/system_sleep.txt); the
+# tail repeats the key list and the compact shape of the object fields,
+# since an agent reused by name or from the state file may still carry an
+# older system prompt without them.
+_PROMPT_HEAD = "CRONOLOGIA:\n"
+_PROMPT_TAIL = (
+    "\n\nRispondi SOLO con il JSON richiesto (persona_updates, human_updates, "
+    "goals_insights, key_events, knowledge_updates, skill_updates, "
+    "emotional_patterns, reflection, priority_actions, priority_score, "
+    "memories_stored). Forma degli oggetti: "
+    'key_events [{"description", "importance"}], '
+    'knowledge_updates [{"concept", "description", "category"}], '
+    'skill_updates [{"name", "procedure", "confidence"}], '
+    'emotional_patterns [{"dominant_emotion", "intensity", "trigger"}]. '
+    "Non inventare info, no markdown."
+)
+
+
 class ScarletSleepAgent:
     """
     Custom Sleep-Time Agent for memory consolidation.
     
     This agent analyzes recent conversations and generates insights
     to be incorporated into Scarlet's memory.
+    
+    The ``client`` should be the primary agent's Letta client so both
+    agents share one HTTP connection pool (see ScarletAgent._ensure_client).
     """
     
+    __slots__ = (
+        "client", "config", "_agent_id", "_agent", "_embed_fn", "_cache",
+        "_last_lines",
+    )
+    
     DEFAULT_PROMPT_PATH = "prompts/system_sleep.txt"
     
-    def __init__(self, client, config: Optional[SleepAgentConfig] = None):
+    # Insight lists that make a result worth caching
+    _CACHEABLE_FIELDS = (
+        "persona_updates",
+        "human_updates",
+        "goals_insights",
+        "key_events",
+        "knowledge_updates",
+        "skill_updates",
+        "emotional_patterns",
+    )
+    
+    def __init__(
+        self,
+        client,
+        config: Optional[SleepAgentConfig] = None,
+        embed_fn: Optional[Callable[[str], List[float]]] = None
+    ):
         """
         Initialize sleep-time agent.
         
         Args:
             client: Letta client instance
             config: Optional configuration
+            embed_fn: Optional text -> vector function enabling the
+                semantic insights cache
         """
+        _ensure_env()
         self.client = client
         self.config = config or SleepAgentConfig()
         self._agent_id = None
         self._agent = None
+        self._embed_fn = embed_fn
+        self._cache = (
+            _SemanticCache(self.config.cache_similarity, self.config.cache_size)
+            if embed_fn is not None and self.config.cache_size > 0 else None
+        )
+        # Lines of the last consolidated history (novelty guard baseline)
+        self._last_lines: Optional[frozenset] = None
     
     @property
     def is_created(self) -> bool:
@@ -88,16 +407,12 @@ class ScarletSleepAgent:
         return self._agent_id is not None
     
     def _load_system_prompt(self) -> str:
-        """Load the system prompt from file."""
+        """Load the system prompt from file (cached until it changes)."""
         prompt_path = Path(self.DEFAULT_PROMPT_PATH)
         if not prompt_path.is_absolute():
             prompt_path = Path(__file__).parent.parent / prompt_path
         
-        if not prompt_path.exists():
-            raise FileNotFoundError(f"Sleep system prompt not found: {prompt_path}")
-        
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return _read_prompt(prompt_path, "Sleep system prompt")
     
     def create(self) -> str:
         """
@@ -108,7 +423,7 @@ class ScarletSleepAgent:
         """
         # Prevent duplicate creation
         if self.is_created:
-            print(f"[ScarletSleepAgent] Agent already exists: {self._agent_id}")
+            logger.info("[ScarletSleepAgent] Agent already exists: %s", self._agent_id)
             return self._agent_id
         
         system_prompt = self._load_system_prompt()
@@ -120,45 +435,21 @@ class ScarletSleepAgent:
                 system=system_prompt,
                 model=self.config.model
             )
-            self._agent_id = self._agent.id
-            print(f"[ScarletSleepAgent] Created: {self._agent_id}")
-            return self._agent_id
-        except Exception as e:
+        except _LETTA_ERRORS as e:
             raise RuntimeError(f"Failed to create sleep agent: {e}") from e
+        
+        self._agent_id = self._agent.id
+        logger.info("[ScarletSleepAgent] Created: %s", self._agent_id)
+        return self._agent_id
     
     def _build_consolidation_prompt(self, conversation_history: str) -> str:
         """
-        Build the full consolidation prompt with conversation history.
-        
-        Uses separate strings to avoid triple-quote issues.
-        """
-        # Build the prompt in parts to avoid syntax issues with triple quotes
-        parts = []
-        parts.append("Sei Scarlet-Sleep, un agente specializzato per il consolidamento della memoria.")
-        parts.append("")
-        parts.append("ANALISI: Analizza la cronologia e genera insights JSON strutturati.")
-        parts.append("")
-        parts.append("CRONOLOGIA:")
-        parts.append(conversation_history)
-        parts.append("")
-        parts.append("OUTPUT JSON:")
-        parts.append('{')
-        parts.append('    "persona_updates": ["insight su Scarlet"],')
-        parts.append('    "human_updates": ["info sull umano"],')
-        parts.append('    "goals_insights": ["progressi verso obiettivi"],')
-        parts.append('    "key_events": [{"description": "evento", "importance": 0.8}],')
-        parts.append('    "knowledge_updates": [{"concept": "concetto", "description": "...", "category": "tech"}],')
-        parts.append('    "skill_updates": [{"name": "skill", "procedure": "...", "confidence": 0.8}],')
-        parts.append('    "emotional_patterns": [{"dominant_emotion": "curiosity", "intensity": 0.6, "trigger": "..."}],')
-        parts.append('    "reflection": "sintesi dei pattern emersi",')
-        parts.append('    "priority_actions": ["azioni da ricordare"],')
-        parts.append('    "priority_score": 0.7,')
-        parts.append('    "memories_stored": {"episodic": 1, "knowledge": 1, "skills": 1, "emotional": 1}')
-        parts.append('}')
-        parts.append("")
-        parts.append("REGOLE: Non inventare info. Solo JSON, no markdown. Sii specifico e conciso.")
-        
-        return "\n".join(parts)
+        Build the per-call consolidation message for conversation history.
+        
+        The schema is in the system prompt; this is a plain concatenation
+        of the history between two constant strings.
+        """
+        return _PROMPT_HEAD + conversation_history + _PROMPT_TAIL
     
     def consolidate(self, conversation_history: str) -> Dict[str, Any]:
         """
@@ -169,60 +460,113 @@ class ScarletSleepAgent:
             
         Returns:
             Dictionary with persona_updates, human_updates, goals_insights, etc.
+            On a semantic cache hit the update lists are empty and
+            ``cached`` is True; when too little changed since the last cycle
+            ``skipped`` is True. The orchestrator applies and stores neither.
         """
         if not self.is_created:
             raise RuntimeError("Sleep agent not created. Call create() first.")
         
+        conversation_history = _tail_history(
+            conversation_history, self.config.max_history_chars
+        )
+        
+        # Too little new text since the last cycle: nothing to consolidate
+        lines = frozenset(conversation_history.splitlines())
+        if self._is_trivial_delta(lines):
+            logger.info("[ScarletSleepAgent] No significant new messages, skipping LLM call")
+            insights = _empty_insights("Nessuna novità rilevante dall'ultimo consolidamento", 0.1)
+            insights["skipped"] = True
+            return insights
+        
+        # Near-identical history: its insights were already applied when
+        # first generated, so skip the LLM call and report nothing new
+        vector = self._embed(conversation_history)
+        if vector is not None:
+            cached = self._cache.lookup(vector)
+            if cached is not None:
+                logger.info("[ScarletSleepAgent] Semantic cache hit, skipping LLM call")
+                self._last_lines = lines
+                insights = _empty_insights(
+                    cached.get("reflection") or "Cronologia già consolidata", 0.1
+                )
+                insights["cached"] = True
+                return insights
+        
+        # History only: instructions come from the system prompt
+        prompt = self._build_consolidation_prompt(conversation_history)
+        messages = [{"role": "user", "content": prompt}]
+        
         try:
-            # Build the consolidation prompt inline (avoids template issues)
-            prompt = self._build_consolidation_prompt(conversation_history)
-            
-            response = self.client.agents.messages.create(
-                agent_id=self._agent_id,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            # Extract response text
-            response_text = ""
-            if hasattr(response, 'messages') and response.messages:
-                msg = response.messages[0]
-                if hasattr(msg, 'content') and msg.content:
-                    response_text = msg.content
-                elif hasattr(msg, 'assistant_message') and msg.assistant_message:
-                    response_text = msg.assistant_message
-            
-            # Parse JSON response
-            return self._parse_insights(response_text)
-            
-        except Exception as e:
+            if self.config.stream_response:
+                response_text = _read_json_stream(
+                    self.client.agents.messages.stream(
+                        agent_id=self._agent_id,
+                        messages=messages,
+                        stream_tokens=True
+                    )
+                )
+            else:
+                response = self.client.agents.messages.create(
+                    agent_id=self._agent_id,
+                    messages=messages
+                )
+                response_text = _reply_text(response) or ""
+        except _LETTA_ERRORS as e:
             raise RuntimeError(f"Failed to consolidate memory: {e}") from e
+        
+        # Parse JSON response (never raises: falls back to empty insights)
+        insights = self._parse_insights(response_text)
+        
+        # Empty and fallback results are not cached, so they get retried
+        if vector is not None and any(insights.get(k) for k in self._CACHEABLE_FIELDS):
+            self._cache.add(vector, insights)
+        
+        self._last_lines = lines
+        return insights
+    
+    def _is_trivial_delta(self, lines: frozenset) -> bool:
+        """True when lines unseen in the last consolidated history hold too few words."""
+        if self._last_lines is None or self.config.min_new_words <= 0:
+            return False
+        new_words = 0
+        for line in lines - self._last_lines:
+            new_words += len(line.split())
+            if new_words >= self.config.min_new_words:
+                return False
+        return True
+    
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for the semantic cache (None when unavailable)."""
+        if self._cache is None:
+            return None
+        try:
+            return _normalize(self._embed_fn(text))
+        except Exception as e:
+            logger.warning("[ScarletSleepAgent] Embedding failed, bypassing cache: %s", e)
+            return None
     
     def _parse_insights(self, response_text: str) -> Dict[str, Any]:
-        """Parse JSON response from sleep agent."""
+        """
+        Parse JSON response from sleep agent (identical responses are cached).
+        
+        Every call returns a deep copy, so callers may mutate the result
+        without touching the cached entry.
+        """
+        key = hashlib.blake2b(response_text.encode("utf-8"), digest_size=16).digest()
+        with _PARSED_CACHE_LOCK:
+            hit = _PARSED_CACHE.get(key)
+            if hit is not None:
+                _PARSED_CACHE.move_to_end(key)
+                return copy.deepcopy(hit)
+        
         try:
-            # Try to extract JSON from response
-            text = response_text.strip()
-            
-            # Remove markdown code blocks if present
-            if text.startswith("```"):
-                lines = text.split("\n")
-                text = "\n".join(lines[1:-1])
-            if text.startswith("```json"):
-                lines = text.split("\n")
-                text = "\n".join(lines[1:-1])
-            
-            # Find JSON object
-            start = text.find("{")
-            end = text.rfind("}")
-            
-            if start != -1 and end != -1:
-                json_text = text[start:end+1]
-                parsed = json.loads(json_text)
-            else:
-                parsed = {}
+            # Find JSON object (also skips markdown code fences)
+            match = _JSON_OBJECT_RE.search(response_text)
+            parsed = _json_loads(match.group()) if match else {}
             
             # Ensure all expected fields are present with defaults
-            return {
+            insights = {
                 "persona_updates": parsed.get("persona_updates", []),
                 "human_updates": parsed.get("human_updates", []),
                 "goals_insights": parsed.get("goals_insights", []),
@@ -241,36 +585,18 @@ class ScarletSleepAgent:
                 })
             }
             
+            with _PARSED_CACHE_LOCK:
+                _PARSED_CACHE[key] = insights
+                if len(_PARSED_CACHE) > _PARSED_CACHE_MAX:
+                    _PARSED_CACHE.popitem(last=False)
+            return copy.deepcopy(insights)
+            
         except json.JSONDecodeError as e:
-            print(f"[ScarletSleepAgent] Warning: Failed to parse JSON response: {e}")
-            return {
-                "persona_updates": [],
-                "human_updates": [],
-                "goals_insights": [],
-                "key_events": [],
-                "knowledge_updates": [],
-                "skill_updates": [],
-                "emotional_patterns": [],
-                "reflection": "Parse error - returning empty insights",
-                "priority_actions": [],
-                "priority_score": 0.3,
-                "memories_stored": {"episodic": 0, "knowledge": 0, "skills": 0, "emotional": 0}
-            }
+            logger.warning("[ScarletSleepAgent] Failed to parse JSON response: %s", e)
+            return _empty_insights("Parse error - returning empty insights")
         except Exception as e:
-            print(f"[ScarletSleepAgent] Warning: Unexpected error parsing insights: {e}")
-            return {
-                "persona_updates": [],
-                "human_updates": [],
-                "goals_insights": [],
-                "key_events": [],
-                "knowledge_updates": [],
-                "skill_updates": [],
-                "emotional_patterns": [],
-                "reflection": f"Error: {str(e)}",
-                "priority_actions": [],
-                "priority_score": 0.3,
-                "memories_stored": {"episodic": 0, "knowledge": 0, "skills": 0, "emotional": 0}
-            }
+            logger.warning("[ScarletSleepAgent] Unexpected error parsing insights: %s", e)
+            return _empty_insights(f"Error: {str(e)}")
     
     def delete(self):
         """Delete the sleep-time agent."""
@@ -280,13 +606,104 @@ class ScarletSleepAgent:
                 self._agent_id = None
                 self._agent = None
             except Exception as e:
-                print(f"Warning: Failed to delete sleep agent: {e}")
+                logger.warning("[ScarletSleepAgent] Failed to delete sleep agent: %s", e)
 
 
 # =============================================================================
 # SLEEP-TIME ORCHESTRATOR
 # =============================================================================
 
+# Internal Letta message types that carry no conversation content
+_SKIP_MSG_TYPES = frozenset({
+    "tool_call_message",
+    "tool_return_message",
+    "function_call",
+    "function_return",
+})
+
+# Bullet formatter for goals insights appended to the goals block
+_GOAL_FMT = "- {}".format
+
+# Conversation role for each relevant Letta message type
+_ROLE_BY_MSG_TYPE = {
+    "user_message": "user",
+    "assistant_message": "assistant",
+    "assistant": "assistant",
+}
+
+
+# Message types requested from the server when building history, so
+# reasoning and tool traffic does not use up the fetch limit
+_CONVERSATION_MSG_TYPES = ["user_message", "assistant_message"]
+
+
+def _list_messages(messages_api, **kwargs):
+    """List agent messages, filtered server-side to conversation types when supported."""
+    try:
+        return messages_api.list(include_return_message_types=_CONVERSATION_MSG_TYPES, **kwargs)
+    except TypeError:
+        # SDK without message type filtering
+        return messages_api.list(**kwargs)
+
+
+def _message_list(response) -> list:
+    """
+    Messages of a list response (SDK page, dict or plain list).
+    
+    Only the first page is read: iterating an SDK page follows its
+    cursors and would download the whole history.
+    """
+    if isinstance(response, dict):
+        return response.get('messages') or []
+    messages = getattr(response, 'messages', None)
+    if messages is None:
+        messages = getattr(response, 'items', None)
+    if messages is None:
+        messages = list(response) if response else []
+    return messages
+
+
+def _extract_message(msg) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resolve (role, content) from a Letta message object or dict.
+    
+    Returns (None, None) for internal tool/function messages.
+    """
+    if isinstance(msg, dict):
+        msg_type = msg.get('message_type')
+        if msg_type in _SKIP_MSG_TYPES:
+            return None, None
+        content = msg.get('content') or msg.get('assistant_message')
+        role = _ROLE_BY_MSG_TYPE.get(msg_type) or msg.get('role')
+    else:
+        msg_type = getattr(msg, 'message_type', None)
+        if msg_type in _SKIP_MSG_TYPES:
+            return None, None
+        content = getattr(msg, 'content', None) or getattr(msg, 'assistant_message', None)
+        role = _ROLE_BY_MSG_TYPE.get(msg_type) or getattr(msg, 'role', None)
+    
+    if not content:
+        return role, None
+    return role, (content if isinstance(content, str) else str(content))
+
+
+def _read_state(path: Path) -> Optional[Dict[str, Any]]:
+    """Read the orchestrator state file (None when missing or unreadable)."""
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("[SleepTimeOrchestrator] Could not read state file %s: %s", path, e)
+        return None
+    
+    try:
+        return _json_loads(raw)
+    except ValueError as e:
+        logger.warning("[SleepTimeOrchestrator] Ignoring unreadable state file %s: %s", path, e)
+        return None
+
+
 class SleepTimeOrchestrator:
     """
     Coordinates the sleep-time cycle for Scarlet.
@@ -295,12 +712,48 @@ class SleepTimeOrchestrator:
     Can be triggered automatically or manually.
     """
     
+    __slots__ = (
+        "primary",
+        "sleep",
+        "message_count",
+        "threshold",
+        "_auto_trigger",
+        "_sleep_enabled_cached",
+        "last_consolidation",
+        "consolidation_history",
+        "_consolidation_total",
+        "_lock",
+        "_running",
+        "_max_wait",
+        "_pending_trigger_timer",
+        "_executor",
+        "_queued",
+        "_last_seen_message_id",
+        "_cached_turns",
+        "_state_path",
+        "on_consolidation_start",
+        "on_consolidation_complete",
+        "on_consolidation_error",
+    )
+    
+    # Number of complete turns (user + assistant) sent to the sleep agent
+    RECENT_TURNS = 5
+    
+    # Messages read per fetch
+    FETCH_LIMIT = 100
+    
+    # Consolidation records kept in memory (older entries are dropped)
+    HISTORY_MAXLEN = 256
+    
     def __init__(
         self,
         primary_agent,
         sleep_agent: ScarletSleepAgent,
         message_threshold: int = 5,
-        auto_trigger: bool = True
+        auto_trigger: bool = True,
+        max_wait: float = 0.5,
+        state_path: Optional[Path] = None,
+        history_cap: Optional[int] = None
     ):
         """
         Initialize orchestrator.
@@ -310,19 +763,92 @@ class SleepTimeOrchestrator:
             sleep_agent: ScarletSleepAgent instance
             message_threshold: Messages before triggering consolidation
             auto_trigger: Whether to auto-trigger after messages
+            max_wait: Seconds to wait after the threshold is crossed so a
+                burst of messages is absorbed into a single cycle
+            state_path: Optional JSON file where the message cursor and
+                consolidation history survive process restarts
+            history_cap: Consolidation records kept in memory
+                (defaults to HISTORY_MAXLEN)
         """
         self.primary = primary_agent
         self.sleep = sleep_agent
         self.message_count = 0
         self.threshold = message_threshold
-        self.auto_trigger = auto_trigger
+        self._auto_trigger = auto_trigger
+        self._sleep_enabled_cached: Optional[bool] = None
         self.last_consolidation = None
-        self.consolidation_history = []
+        self.consolidation_history: deque = deque(maxlen=history_cap or self.HISTORY_MAXLEN)
+        self._consolidation_total = 0
+        
+        # Guard against overlapping consolidation cycles
+        self._lock = threading.Lock()
+        self._running = False
+        
+        # Debounce timer armed when the threshold is crossed
+        self._max_wait = max_wait
+        self._pending_trigger_timer: Optional[threading.Timer] = None
+        
+        # Auto-triggered cycles run here so chat() is never blocked; at most
+        # one cycle waits in the queue, later triggers coalesce into it
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scarlet-sleep")
+        self._queued = False
+        
+        # Incremental fetch state: cursor of the last message seen and the
+        # turns already parsed, so each cycle only downloads new messages
+        self._last_seen_message_id: Optional[str] = None
+        self._cached_turns: deque = deque(maxlen=self.RECENT_TURNS)
         
         # Callbacks for external monitoring
         self.on_consolidation_start: Optional[Callable] = None
         self.on_consolidation_complete: Optional[Callable] = None
         self.on_consolidation_error: Optional[Callable] = None
+        
+        # Warm start from a previous process
+        self._state_path = Path(state_path) if state_path else None
+        if self._state_path is not None:
+            self._load_state()
+    
+    def _load_state(self):
+        """Seed cursor, parsed turns and history from the state file."""
+        state = _read_state(self._state_path)
+        if state is None:
+            return
+        
+        self.consolidation_history.extend(state.get("history", []))
+        self._consolidation_total = state.get("total", len(self.consolidation_history))
+        if state.get("last_consolidation"):
+            self.last_consolidation = datetime.fromisoformat(state["last_consolidation"])
+        
+        # The message cursor is only valid for the agent it was taken from
+        if state.get("agent_id") == self.primary._agent_id:
+            self._last_seen_message_id = state.get("last_seen")
+            self._cached_turns.extend(state.get("turns", []))
+        
+        logger.info("[SleepTimeOrchestrator] Restored state from %s", self._state_path)
+    
+    def _save_state(self):
+        """Atomically write cursor, parsed turns and history to the state file."""
+        state = {
+            "agent_id": self.primary._agent_id,
+            "sleep_agent_id": self.sleep._agent_id,
+            "last_seen": self._last_seen_message_id,
+            "turns": list(self._cached_turns),
+            "history": list(self.consolidation_history),
+            "total": self._consolidation_total,
+            "last_consolidation": (
+                self.last_consolidation.isoformat()
+                if self.last_consolidation else None
+            ),
+        }
+        data = _json_dumps(state)
+        
+        tmp_path = self._state_path.with_name(self._state_path.name + ".tmp")
+        try:
+            self._state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, self._state_path)
+        except OSError as e:
+            logger.warning("[SleepTimeOrchestrator] Could not write state file %s: %s", self._state_path, e)
     
     def on_message(self, message_count: int = 1):
         """
@@ -331,36 +857,125 @@ class SleepTimeOrchestrator:
         Args:
             message_count: Number of messages to add (default 1)
         """
-        if not self.sleep_enabled:
+        # Hot path: read the cached flag directly, fall back to the property
+        # only after an invalidation
+        enabled = self._sleep_enabled_cached
+        if enabled is None:
+            enabled = self.sleep_enabled
+        if not enabled:
             return
             
-        self.message_count += message_count
+        # Count and decide under the lock so concurrent chat() callers
+        # neither lose increments nor race past the running check
+        with self._lock:
+            self.message_count += message_count
+            trigger = not self._running and self.message_count >= self.threshold
+        
+        if trigger:
+            self._schedule_consolidation()
+    
+    def _schedule_consolidation(self):
+        """Arm the debounce timer unless one is already pending."""
+        if self._max_wait <= 0:
+            self._submit_cycle()
+            return
+        
+        with self._lock:
+            if self._pending_trigger_timer is not None:
+                return
+            timer = threading.Timer(self._max_wait, self._fire)
+            timer.daemon = True
+            self._pending_trigger_timer = timer
+        timer.start()
+    
+    def _fire(self):
+        """Debounce timer callback: run one consolidation for the burst."""
+        with self._lock:
+            self._pending_trigger_timer = None
         
-        if self.auto_trigger and self.message_count >= self.threshold:
-            self.run_consolidation()
+        if self._running or not self.sleep_enabled:
+            return
+        self._submit_cycle()
+    
+    def _submit_cycle(self):
+        """Queue one background cycle unless one is already waiting."""
+        with self._lock:
+            if self._queued:
+                return
+            self._queued = True
+        self._executor.submit(self._run_queued_cycle)
+    
+    def _run_queued_cycle(self):
+        """Worker entry point: release the queue slot, then consolidate."""
+        with self._lock:
+            self._queued = False
+        self.run_consolidation()
+    
+    def shutdown(self, wait: bool = True):
+        """Cancel any pending trigger and stop the background worker."""
+        with self._lock:
+            timer, self._pending_trigger_timer = self._pending_trigger_timer, None
+        if timer is not None:
+            timer.cancel()
+        self._executor.shutdown(wait=wait)
+    
+    @property
+    def auto_trigger(self) -> bool:
+        """Whether consolidation is triggered automatically after messages."""
+        return self._auto_trigger
+    
+    @auto_trigger.setter
+    def auto_trigger(self, value: bool):
+        self._auto_trigger = value
+        self._sleep_enabled_cached = None
     
     @property
     def sleep_enabled(self) -> bool:
-        """Check if sleep-time system is enabled."""
-        return (
-            self.sleep.is_created and 
-            self.primary.is_created and
-            self.auto_trigger
-        )
+        """
+        Check if sleep-time system is enabled.
+        
+        Cached after the first check; call invalidate_sleep_enabled()
+        when either agent is created or deleted.
+        """
+        enabled = self._sleep_enabled_cached
+        if enabled is None:
+            enabled = self._sleep_enabled_cached = bool(
+                self.sleep.is_created and 
+                self.primary.is_created and
+                self._auto_trigger
+            )
+        return enabled
+    
+    def invalidate_sleep_enabled(self):
+        """Drop the cached sleep_enabled value."""
+        self._sleep_enabled_cached = None
     
     def run_consolidation(self) -> Optional[Dict[str, Any]]:
         """
         Run a full consolidation cycle.
         
         Returns:
-            Insights dictionary or None if failed
+            Insights dictionary or None if failed or a cycle is already running
         """
-        # Notify start
-        if self.on_consolidation_start:
-            self.on_consolidation_start()
+        with self._lock:
+            if self._running:
+                logger.info("[SleepTimeOrchestrator] Consolidation already running, skipping")
+                return None
+            self._running = True
+            # Messages this cycle covers; later ones count toward the next
+            consumed = self.message_count
+        backlog = False
         
         try:
-            print(f"[SleepTimeOrchestrator] Starting consolidation...")
+            # Notify start
+            if self.on_consolidation_start:
+                self.on_consolidation_start()
+            
+            logger.info("[SleepTimeOrchestrator] Starting consolidation...")
+            
+            # Single timestamp for the whole cycle, formatted once
+            now = datetime.now()
+            now_iso = now.isoformat()
             
             # Step 1: Get recent conversation history
             messages = self._get_recent_messages()
@@ -369,25 +984,39 @@ class SleepTimeOrchestrator:
             insights = self.sleep.consolidate(messages)
             
             # Step 3: Apply insights to primary agent memory
-            self._apply_insights(insights)
-            
-            # Step 4: Store memories to Qdrant if MemoryManager is available
-            self._store_consolidated_memories(messages, insights)
+            persona = insights.get("persona_updates") or ()
+            human = insights.get("human_updates") or ()
+            goals = insights.get("goals_insights") or ()
+            if insights.get("cached") or insights.get("skipped"):
+                # Already applied and stored when first generated, or
+                # nothing new: storing would duplicate the old history
+                logger.info("[SleepTimeOrchestrator] History already consolidated, nothing to apply")
+            else:
+                self._apply_insights(persona, human, goals, now_iso)
+                
+                # Step 4: Store memories to Qdrant if MemoryManager is available
+                self._store_consolidated_memories(messages, insights)
             
             # Update state
-            self.last_consolidation = datetime.now()
-            self.message_count = 0
+            self.last_consolidation = now
+            with self._lock:
+                self.message_count = max(0, self.message_count - consumed)
+                backlog = self.message_count >= self.threshold
             self.consolidation_history.append({
-                "timestamp": self.last_consolidation.isoformat(),
+                "timestamp": now_iso,
                 "insights_count": {
-                    "persona": len(insights.get("persona_updates", [])),
-                    "human": len(insights.get("human_updates", [])),
-                    "goals": len(insights.get("goals_insights", []))
+                    "persona": len(persona),
+                    "human": len(human),
+                    "goals": len(goals)
                 },
                 "memories_stored": insights.get("memories_stored", {})
             })
+            self._consolidation_total += 1
+            
+            if self._state_path is not None:
+                self._save_state()
             
-            print(f"[SleepTimeOrchestrator] Consolidation complete")
+            logger.info("[SleepTimeOrchestrator] Consolidation complete")
             
             # Notify complete
             if self.on_consolidation_complete:
@@ -396,12 +1025,18 @@ class SleepTimeOrchestrator:
             return insights
             
         except Exception as e:
-            print(f"[SleepTimeOrchestrator] Error: {e}")
+            logger.error("[SleepTimeOrchestrator] Error: %s", e)
             
             if self.on_consolidation_error:
                 self.on_consolidation_error(e)
             
             return None
+        
+        finally:
+            self._running = False
+            # Threshold crossed again while this cycle ran
+            if backlog and self.sleep_enabled:
+                self._schedule_consolidation()
     
     def _store_consolidated_memories(
         self, 
@@ -419,10 +1054,10 @@ class SleepTimeOrchestrator:
             # Check if MemoryManager is available
             memory_manager = self.primary.memory_manager
             if memory_manager is None:
-                print("[SleepTimeOrchestrator] MemoryManager not available, skipping Qdrant storage")
+                logger.info("[SleepTimeOrchestrator] MemoryManager not available, skipping Qdrant storage")
                 return
             
-            print("[SleepTimeOrchestrator] Storing memories to Qdrant...")
+            logger.info("[SleepTimeOrchestrator] Storing memories to Qdrant...")
             
             # Extract and store episodic memories from conversation
             episodic_content = self._extract_episodic_content(conversation_history, insights)
@@ -435,7 +1070,7 @@ class SleepTimeOrchestrator:
                     emotional_tone=episodic_content.get("emotions", ["neutral"])[0] if episodic_content.get("emotions") else None,
                     tags=["sleep_consolidation", "auto_generated"]
                 )
-                print(f"[SleepTimeOrchestrator] Stored episodic memory: {len(episodic_content['content'])} chars")
+                logger.info("[SleepTimeOrchestrator] Stored episodic memory: %d chars", len(episodic_content['content']))
             
             # Extract and store knowledge/concepts
             knowledge_updates = insights.get("knowledge_updates", [])
@@ -450,7 +1085,7 @@ class SleepTimeOrchestrator:
                         importance=knowledge.get("importance", 0.5),
                         tags=["sleep_consolidation", "auto_generated"]
                     )
-                    print(f"[SleepTimeOrchestrator] Stored knowledge: {knowledge['concept']}")
+                    logger.info("[SleepTimeOrchestrator] Stored knowledge: %s", knowledge['concept'])
             
             # Extract and store skills
             skill_updates = insights.get("skill_updates", [])
@@ -465,7 +1100,7 @@ class SleepTimeOrchestrator:
                         importance=skill.get("confidence", 0.7),
                         tags=["sleep_consolidation", "auto_generated"]
                     )
-                    print(f"[SleepTimeOrchestrator] Stored skill: {skill['name']}")
+                    logger.info("[SleepTimeOrchestrator] Stored skill: %s", skill['name'])
             
             # Store emotional patterns if detected
             emotional_patterns = insights.get("emotional_patterns", [])
@@ -478,12 +1113,12 @@ class SleepTimeOrchestrator:
                     context_pattern=emotional_patterns[0].get("context", ""),
                     importance=0.5
                 )
-                print(f"[SleepTimeOrchestrator] Stored emotional pattern")
+                logger.info("[SleepTimeOrchestrator] Stored emotional pattern")
             
-            print("[SleepTimeOrchestrator] Memory storage complete")
+            logger.info("[SleepTimeOrchestrator] Memory storage complete")
             
         except Exception as e:
-            print(f"[SleepTimeOrchestrator] Warning: Failed to store memories to Qdrant: {e}")
+            logger.warning("[SleepTimeOrchestrator] Failed to store memories to Qdrant: %s", e)
     
     def _extract_episodic_content(
         self, 
@@ -506,11 +1141,13 @@ class SleepTimeOrchestrator:
             
             if not key_events:
                 # Fallback: use conversation highlights
-                lines = conversation_history.split('\n')
-                meaningful_lines = [
-                    l for l in lines 
-                    if l and not l.startswith('[') and len(l) > 20
-                ][:10]
+                meaningful_lines = islice(
+                    (
+                        l for l in conversation_history.split('\n')
+                        if len(l) > 20 and not l.startswith('[')
+                    ),
+                    10
+                )
                 content = " ".join(meaningful_lines)
             else:
                 # Build episodic content from key events
@@ -537,7 +1174,7 @@ class SleepTimeOrchestrator:
             }
             
         except Exception as e:
-            print(f"[SleepTimeOrchestrator] Error extracting episodic content: {e}")
+            logger.error("[SleepTimeOrchestrator] Error extracting episodic content: %s", e)
             return None
     
     def _get_recent_messages(self) -> str:
@@ -545,58 +1182,73 @@ class SleepTimeOrchestrator:
         Get recent conversation messages in full, grouped by turns.
         
         Returns complete messages from the last N turns without truncation.
+        Only messages after the last seen one are fetched; turns parsed in
+        previous cycles are reused. Falls back to a full fetch of the newest
+        page when no cursor is available, the SDK does not support
+        ``after``, or more than a page arrived since the last cycle (older
+        messages could not reach the last N turns anyway). The server is
+        asked for user/assistant messages only.
         """
         try:
-            response = self.primary._client.agents.messages.list(
-                agent_id=self.primary._agent_id,
-                limit=100  # Get enough to form complete turns
-            )
+            messages_api = self.primary._client.agents.messages
+            agent_id = self.primary._agent_id
             
-            # Handle different response types
-            if hasattr(response, 'messages'):
-                messages = response.messages
-            elif isinstance(response, dict) and 'messages' in response:
-                messages = response['messages']
+            messages = None
+            if self._last_seen_message_id is not None:
+                try:
+                    messages = _message_list(_list_messages(
+                        messages_api,
+                        agent_id=agent_id,
+                        limit=self.FETCH_LIMIT,
+                        after=self._last_seen_message_id,
+                        order="asc"
+                    ))
+                except TypeError:
+                    # SDK without cursor support
+                    messages = None
+                if messages is not None and len(messages) >= self.FETCH_LIMIT:
+                    # Backlog larger than a page: skip it and read the newest
+                    # page, so the cursor lands on the newest message
+                    logger.info("[SleepTimeOrchestrator] Over %d new messages, reading the newest only", self.FETCH_LIMIT)
+                    messages = None
+            
+            if messages is None:
+                # Full fetch: previously parsed turns would be duplicated
+                self._cached_turns.clear()
+                newest_first = _message_list(_list_messages(
+                    messages_api,
+                    agent_id=agent_id,
+                    limit=self.FETCH_LIMIT,  # Get enough to form complete turns
+                    order="desc"
+                ))
+                messages = newest_first[::-1]
+            
+            # Build turn-based structure (user + assistant = 1 turn),
+            # resuming from the turns parsed in previous cycles
+            turns = list(self._cached_turns)
+            if turns and not turns[-1]["assistant"]:
+                current_turn = turns.pop()
             else:
-                messages = list(response) if response else []
-            
-            # Build turn-based structure (user + assistant = 1 turn)
-            turns = []
-            current_turn = {"user": None, "assistant": None}
+                current_turn = {"user": None, "assistant": None}
             
             for msg in messages:
-                # Get message type
-                msg_type = getattr(msg, 'message_type', None)
-                if isinstance(msg, dict):
-                    msg_type = msg.get('message_type', None)
-                
-                # Get content
-                content = None
-                if hasattr(msg, 'content') and msg.content:
-                    content = str(msg.content)
-                elif hasattr(msg, 'assistant_message') and msg.assistant_message:
-                    content = str(msg.assistant_message)
-                elif isinstance(msg, dict):
-                    content = str(msg.get("content", ""))
+                # Internal messages come back with no content
+                role, content = _extract_message(msg)
                 
-                if not content or not content.strip():
+                # isspace() tests for blank content without a stripped copy
+                if not content or content.isspace():
                     continue
                 
                 # Clean up thinking blocks
-                if 'Thinking:' in content:
-                    content = content.split('Thinking:')[-1].strip()
+                content = _strip_thinking(content)
                 
-                # Classify by type
-                if msg_type in ['tool_call_message', 'tool_return_message', 'function_call', 'function_return']:
-                    continue  # Skip internal messages
-                
-                if msg_type == 'user_message' or msg.get("role") == "user":
+                if role == "user":
                     # If we have a pending assistant, save turn and start new
                     if current_turn["assistant"]:
                         turns.append(current_turn)
                         current_turn = {"user": None, "assistant": None}
                     current_turn["user"] = content
-                elif msg_type in ['assistant_message', 'assistant'] or msg.get("role") == "assistant":
+                elif role == "assistant":
                     current_turn["assistant"] = content
             
             # Don't forget the last turn if it has content
@@ -604,79 +1256,90 @@ class SleepTimeOrchestrator:
                 turns.append(current_turn)
             
             # Take last N complete turns
-            N_TURNS = 5
-            recent_turns = turns[-N_TURNS:] if len(turns) > N_TURNS else turns
-            
-            # Format as readable text (no truncation)
-            formatted = []
-            for i, turn in enumerate(recent_turns):
-                if turn["user"]:
-                    formatted.append(f"USER: {turn['user']}")
-                if turn["assistant"]:
-                    formatted.append(f"ASSISTANT: {turn['assistant']}")
-            
-            if not formatted:
-                return "[Nessun messaggio trovato]"
+            recent_turns = turns[-self.RECENT_TURNS:]
+            
+            # Advance the cursor and keep the parsed tail for the next cycle
+            if messages:
+                last = messages[-1]
+                last_id = last.get('id') if isinstance(last, dict) else getattr(last, 'id', None)
+                if last_id:
+                    self._last_seen_message_id = last_id
+            self._cached_turns.clear()
+            self._cached_turns.extend(recent_turns)
+            
+            # Format as readable text (no truncation), joined in one pass
+            formatted = "\n\n".join(
+                f"{speaker}: {text}"
+                for turn in recent_turns
+                for speaker, text in (("USER", turn["user"]), ("ASSISTANT", turn["assistant"]))
+                if text
+            )
             
-            return "\n\n".join(formatted)
+            return formatted or "[Nessun messaggio trovato]"
             
         except Exception as e:
             return f"Error getting messages: {e}"
     
-    def _apply_insights(self, insights: Dict[str, Any]):
-        """Apply consolidated insights to primary agent memory."""
+    def _apply_insights(
+        self,
+        persona: Sequence[str],
+        human: Sequence[str],
+        goals: Sequence[str],
+        now_iso: Optional[str] = None
+    ):
+        """
+        Apply consolidated insights to primary agent memory.
+        
+        Each block gets one retrieve and one update carrying all of its
+        entries; the persona, human and goals blocks run concurrently.
+        
+        Args:
+            persona: persona_updates from the sleep agent
+            human: human_updates from the sleep agent
+            goals: goals_insights from the sleep agent
+            now_iso: Cycle timestamp (ISO format) stamped on the goals entry
+        """
+        jobs = []
+        
+        # Persona and human updates - append to existing
+        for label, updates in (("persona", persona), ("human", human)):
+            updates = [u for u in updates if isinstance(u, str) and u.strip()]
+            if updates:
+                jobs.append((label, updates))
+        
+        # Log goals insights - append to goals block
+        if goals:
+            goals_text = "\n".join(map(_GOAL_FMT, goals))
+            jobs.append(("goals", [f"[{now_iso or datetime.now().isoformat()}] Insights:\n{goals_text}"]))
+        
+        if not jobs:
+            return
+        if len(jobs) == 1:
+            self._append_to_block(*jobs[0])
+            return
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="scarlet-blocks") as pool:
+            for label, entries in jobs:
+                pool.submit(self._append_to_block, label, entries)
+    
+    def _append_to_block(self, label: str, entries: List[str]):
+        """Append entries to a primary agent memory block in one update."""
         try:
             primary_client = self.primary._client
             agent_id = self.primary._agent_id
-            
-            # Apply persona updates - append to existing
-            for update in insights.get("persona_updates", []):
-                if update.strip():
-                    current = primary_client.agents.blocks.retrieve(
-                        agent_id=agent_id,
-                        block_label="persona"
-                    )
-                    if current:
-                        new_value = f"{current.value}\n\n{update}"
-                        primary_client.agents.blocks.update(
-                            block_label="persona",
-                            agent_id=agent_id,
-                            value=new_value
-                        )
-            
-            # Apply human updates - append to existing
-            for update in insights.get("human_updates", []):
-                if update.strip():
-                    current = primary_client.agents.blocks.retrieve(
-                        agent_id=agent_id,
-                        block_label="human"
-                    )
-                    if current:
-                        new_value = f"{current.value}\n\n{update}"
-                        primary_client.agents.blocks.update(
-                            block_label="human",
-                            agent_id=agent_id,
-                            value=new_value
-                        )
-            
-            # Log goals insights - append to goals block
-            goals = insights.get("goals_insights", [])
-            if goals:
-                goals_text = "\n".join(f"- {g}" for g in goals)
-                current = primary_client.agents.blocks.retrieve(
+            current = primary_client.agents.blocks.retrieve(
+                agent_id=agent_id,
+                block_label=label
+            )
+            if current:
+                entries_text = "\n\n".join(entries)
+                primary_client.agents.blocks.update(
+                    block_label=label,
                     agent_id=agent_id,
-                    block_label="goals"
+                    value=f"{current.value}\n\n{entries_text}"
                 )
-                if current:
-                    new_value = f"{current.value}\n\n[{datetime.now().isoformat()}] Insights:\n{goals_text}"
-                    primary_client.agents.blocks.update(
-                        block_label="goals",
-                        agent_id=agent_id,
-                        value=new_value
-                    )
-            
+                self.primary._invalidate_blocks_cache()
         except Exception as e:
-            print(f"[SleepTimeOrchestrator] Warning: Failed to apply some insights: {e}")
+            logger.warning("[SleepTimeOrchestrator] Failed to apply %s insights: %s", label, e)
     
     def get_status(self) -> Dict[str, Any]:
         """Get orchestrator status."""
@@ -690,7 +1353,7 @@ class SleepTimeOrchestrator:
                 self.last_consolidation.isoformat() 
                 if self.last_consolidation else None
             ),
-            "consolidation_count": len(self.consolidation_history)
+            "consolidation_count": self._consolidation_total
         }
 
 
@@ -712,8 +1375,8 @@ class ScarletAgent:
         - MemoryManager: Extended memory with Qdrant vector storage
     """
 
-    # Default memory blocks in Italian
-    DEFAULT_MEMORY_BLOCKS = [
+    # Default memory blocks in Italian (read-only: shared by every instance)
+    DEFAULT_MEMORY_BLOCKS = tuple(MappingProxyType(block) for block in [
         {
             "label": "persona",
             "description": "Il blocco persona: Memorizza i dettagli sull'identità, carattere, valori di Scarlet e come si comporta e risponde. Aiuta a mantenere coerenza nella sua coscienza digitale.",
@@ -755,7 +1418,10 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             "limit": 2000,
             "read_only": True
         }
-    ]
+    ])
+    
+    # Seconds a fetched core memory block list stays valid
+    _BLOCKS_TTL = 5.0
     
     def __init__(
         self, 
@@ -769,6 +1435,8 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             config: Optional primary agent configuration
             sleep_config: Optional sleep-time agent configuration
         """
+        _ensure_env()
+        
         # Load config from environment if not provided
         if config is None:
             config = ScarletConfig(
@@ -789,20 +1457,37 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         
         # Extended Memory System (MemoryManager with Qdrant)
         self._memory_manager = None
+        
+        # Cached is_sleep_enabled result (see _invalidate_sleep_cache)
+        self._is_sleep_enabled_cached: Optional[bool] = None
+        
+        # Core memory blocks by label, with fetch time (see _get_blocks)
+        self._blocks_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        # Wrappers of the same Letta agent whose block caches are dropped
+        # together with this one (set by ScarletAgentPool)
+        self._block_peers: Optional[List["ScarletAgent"]] = None
     
     def _ensure_client(self):
-        """Ensure Letta client is initialized."""
+        """Ensure Letta client is initialized (shared per server and key)."""
         if self._client is None:
-            try:
-                from letta_client import Letta
-                self._client = Letta(
-                    base_url=self.config.letta_url,
-                    api_key=self.config.api_key or os.getenv("MINIMAX_API_KEY")
-                )
-            except ImportError as e:
-                raise ImportError(
-                    "Letta SDK not installed. Install with: pip install letta-client"
-                ) from e
+            api_key = self.config.api_key or os.getenv("MINIMAX_API_KEY")
+            key = (self.config.letta_url, api_key or "")
+            with _CLIENT_LOCK:
+                client = _CLIENT_CACHE.get(key)
+                if client is None:
+                    try:
+                        from letta_client import Letta
+                    except ImportError as e:
+                        raise ImportError(
+                            "Letta SDK not installed. Install with: pip install letta-client"
+                        ) from e
+                    client = Letta(
+                        base_url=self.config.letta_url,
+                        api_key=api_key,
+                        http_client=_get_http_pool(),
+                    )
+                    _CLIENT_CACHE[key] = client
+            self._client = client
     
     @property
     def is_created(self) -> bool:
@@ -811,12 +1496,21 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
     
     @property
     def is_sleep_enabled(self) -> bool:
-        """Check if custom sleep-time is enabled."""
-        return (
-            self.config.sleep_enabled and 
-            self._sleep_agent is not None and
-            self._sleep_agent.is_created
-        )
+        """Check if custom sleep-time is enabled (cached until agents change)."""
+        enabled = self._is_sleep_enabled_cached
+        if enabled is None:
+            enabled = self._is_sleep_enabled_cached = bool(
+                self.config.sleep_enabled and 
+                self._sleep_agent is not None and
+                self._sleep_agent.is_created
+            )
+        return enabled
+    
+    def _invalidate_sleep_cache(self):
+        """Drop cached sleep-enabled flags after agents are created or deleted."""
+        self._is_sleep_enabled_cached = None
+        if self._orchestrator:
+            self._orchestrator.invalidate_sleep_enabled()
     
     @property
     def sleep_status(self) -> Optional[Dict[str, Any]]:
@@ -837,35 +1531,31 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         """
         # Prevent duplicate creation
         if self.is_created:
-            print(f"[ScarletAgent] Agent already exists: {self._agent_id}")
+            logger.info("[ScarletAgent] Agent already exists: %s", self._agent_id)
             return self._agent_id
         
         self._ensure_client()
 
-        # Read system prompt
+        # Read system prompt (cached: the file does not change across resets)
         prompt_path = Path(self.config.system_prompt_path)
         if not prompt_path.is_absolute():
             prompt_path = Path(__file__).parent.parent / prompt_path
 
-        if not prompt_path.exists():
-            raise FileNotFoundError(f"System prompt not found: {prompt_path}")
-
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            system_prompt = f.read()
+        system_prompt = _read_prompt(prompt_path, "System prompt")
 
         try:
             # Check if agent with same name already exists (use existing!)
             existing_agents = self._client.agents.list()
             for agent in existing_agents:
                 if agent.name == self.config.name:
-                    print(f"[ScarletAgent] Using existing agent: {agent.id}")
+                    logger.info("[ScarletAgent] Using existing agent: %s", agent.id)
                     self._agent_id = agent.id
                     self._agent = agent
                     # Continue to set up sleep agent and orchestrator
                     break
             else:
                 # No existing agent found, create new one
-                print(f"[ScarletAgent] Creating new agent: {self.config.name}")
+                logger.info("[ScarletAgent] Creating new agent: %s", self.config.name)
                 create_params = {
                     "name": self.config.name,
                     "agent_type": "letta_v1_agent",
@@ -889,6 +1579,7 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             # Initialize MemoryManager with Qdrant integration
             self._init_memory_manager()
             
+            self._invalidate_sleep_cache()
             return self._agent_id
         except Exception as e:
             raise RuntimeError(f"Failed to create Scarlet agent: {e}") from e
@@ -898,37 +1589,74 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         if self._sleep_agent is None:
             self._sleep_agent = ScarletSleepAgent(
                 client=self._client,
-                config=self._sleep_config or SleepAgentConfig()
+                config=self._sleep_config or SleepAgentConfig(),
+                embed_fn=self._get_embed_fn()
             )
         
         if not self._sleep_agent.is_created:
-            # Check if sleep agent with same name already exists (use existing!)
-            try:
-                existing_agents = self._client.agents.list()
-                sleep_name = self._sleep_config.name if self._sleep_config else "Scarlet-Sleep"
-                for agent in existing_agents:
-                    if agent.name == sleep_name:
-                        print(f"[ScarletAgent] Using existing sleep agent: {agent.id}")
-                        self._sleep_agent._agent_id = agent.id
-                        self._sleep_agent._agent = agent
-                        break
-                else:
-                    # No existing sleep agent found, create new one
-                    print(f"[ScarletAgent] Creating new sleep agent")
+            # Agent id saved by a previous run: one retrieve instead of a full list
+            self._restore_sleep_agent()
+            
+            if not self._sleep_agent.is_created:
+                # Check if sleep agent with same name already exists (use existing!)
+                try:
+                    existing_agents = self._client.agents.list()
+                    sleep_name = self._sleep_config.name if self._sleep_config else "Scarlet-Sleep"
+                    for agent in existing_agents:
+                        if agent.name == sleep_name:
+                            logger.info("[ScarletAgent] Using existing sleep agent: %s", agent.id)
+                            self._sleep_agent._agent_id = agent.id
+                            self._sleep_agent._agent = agent
+                            break
+                    else:
+                        # No existing sleep agent found, create new one
+                        logger.info("[ScarletAgent] Creating new sleep agent")
+                        self._sleep_agent.create()
+                except Exception as e:
+                    logger.warning("[ScarletAgent] Could not check for existing sleep agent: %s", e)
                     self._sleep_agent.create()
-            except Exception as e:
-                print(f"[ScarletAgent] Warning: Could not check for existing sleep agent: {e}")
-                self._sleep_agent.create()
             
             # Create orchestrator
             self._orchestrator = SleepTimeOrchestrator(
                 primary_agent=self,
                 sleep_agent=self._sleep_agent,
                 message_threshold=self.config.sleep_messages_threshold,
-                auto_trigger=self.config.sleep_enabled
+                auto_trigger=self.config.sleep_enabled,
+                state_path=self.config.sleep_state_path,
+                history_cap=self.config.consolidation_history_cap
             )
             
-            print(f"[ScarletAgent] Sleep-time agent ready: {self._sleep_agent._agent_id}")
+            logger.info("[ScarletAgent] Sleep-time agent ready: %s", self._sleep_agent._agent_id)
+    
+    def _restore_sleep_agent(self):
+        """Reuse the sleep agent recorded in the state file, if it still exists."""
+        if not self.config.sleep_state_path:
+            return
+        state = _read_state(Path(self.config.sleep_state_path))
+        agent_id = state.get("sleep_agent_id") if state else None
+        if not agent_id:
+            return
+        try:
+            agent = self._client.agents.retrieve(agent_id)
+        except Exception as e:
+            logger.info("[ScarletAgent] Saved sleep agent %s unavailable: %s", agent_id, e)
+            return
+        logger.info("[ScarletAgent] Restored sleep agent from state: %s", agent_id)
+        self._sleep_agent._agent_id = agent.id
+        self._sleep_agent._agent = agent
+    
+    def _get_embed_fn(self) -> Optional[Callable[[str], List[float]]]:
+        """Embedding function for the sleep agent's semantic cache."""
+        try:
+            from memory.embedding_manager import EmbeddingManager
+        except ImportError as e:
+            logger.info("[ScarletAgent] Embeddings not available, sleep cache disabled: %s", e)
+            return None
+        
+        # Its LRU keys on a full-text digest, so repeated histories reuse
+        # the vector while histories sharing a prefix stay distinct
+        manager = EmbeddingManager()
+        return lambda text: manager.generate(text).vector
     
     def _init_memory_manager(self):
         """Initialize the MemoryManager with Qdrant integration."""
@@ -947,26 +1675,29 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             
             # Verify Qdrant is connected
             if self._memory_manager.is_qdrant_connected():
-                print(f"[ScarletAgent] MemoryManager initialized with Qdrant")
+                logger.info("[ScarletAgent] MemoryManager initialized with Qdrant")
                 stats = self._memory_manager.get_memory_stats()
-                print(f"[ScarletAgent] Memory stats: {stats['collections']}")
+                logger.info("[ScarletAgent] Memory stats: %s", stats['collections'])
             else:
-                print("[ScarletAgent] Warning: MemoryManager could not connect to Qdrant")
+                logger.warning("[ScarletAgent] MemoryManager could not connect to Qdrant")
                 
         except ImportError as e:
-            print(f"[ScarletAgent] Warning: Memory modules not available: {e}")
+            logger.warning("[ScarletAgent] Memory modules not available: %s", e)
             self._memory_manager = None
         except Exception as e:
-            print(f"[ScarletAgent] Warning: MemoryManager initialization failed: {e}")
+            logger.warning("[ScarletAgent] MemoryManager initialization failed: %s", e)
             self._memory_manager = None
     
     def delete(self):
         """Delete both primary and sleep-time agents."""
         # Delete sleep agent first
         if self._sleep_agent and self._sleep_agent.is_created:
+            if self._orchestrator:
+                self._orchestrator.shutdown()
             self._sleep_agent.delete()
             self._sleep_agent = None
             self._orchestrator = None
+            self._invalidate_sleep_cache()
         
         # Delete primary agent
         if self.is_created:
@@ -974,8 +1705,9 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
                 self._client.agents.delete(self._agent_id)
                 self._agent_id = None
                 self._agent = None
+                self._invalidate_sleep_cache()
             except Exception as e:
-                print(f"Warning: Failed to delete primary agent: {e}")
+                logger.warning("[ScarletAgent] Failed to delete primary agent: %s", e)
 
     def chat(self, message: str) -> str:
         """
@@ -996,22 +1728,16 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
                 messages=[{'role': 'user', 'content': message}]
             )
             # Response has .messages list with the reply
-            if hasattr(response, 'messages') and response.messages:
-                msg = response.messages[0]
-                # Handle different message types
-                if hasattr(msg, 'content') and msg.content:
-                    # Check if it's a thinking block (contains 'Thinking:')
-                    if 'Thinking:' in msg.content:
-                        # Extract just the assistant message
-                        response_text = msg.content.split('Thinking:')[-1].strip()
-                    else:
-                        response_text = msg.content
-                elif hasattr(msg, 'assistant_message') and msg.assistant_message:
-                    response_text = msg.assistant_message
-                else:
-                    response_text = str(response)
+            text = _reply_text(response)
+            if text is None:
+                response_text = str(response)
+            else:
+                response_text = _strip_thinking(text)
+            
+            # The agent may have edited its own blocks during the turn
+            self._invalidate_blocks_cache()
             
-            # Trigger sleep-time check (counts as 1 message)
+            # Trigger sleep-time check (counts as 1 message, runs in background)
             if self.is_sleep_enabled:
                 self._orchestrator.on_message(1)
             
@@ -1019,10 +1745,22 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         except Exception as e:
             raise RuntimeError(f"Failed to send message to Scarlet: {e}") from e
     
+    async def chat_async(self, message: str) -> str:
+        """
+        Async variant of chat() for callers running an event loop.
+        
+        The blocking Letta call runs in a worker thread, so the loop keeps
+        serving other requests while Scarlet answers.
+        """
+        return await asyncio.to_thread(self.chat, message)
+    
     def force_consolidation(self) -> Optional[Dict[str, Any]]:
         """
         Manually trigger memory consolidation.
         
+        Runs synchronously in the caller's thread, unlike auto-triggered
+        cycles which run on the orchestrator's background worker.
+        
         Returns:
             Insights dictionary or None if failed
         """
@@ -1030,6 +1768,10 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             raise RuntimeError("Sleep-time not enabled. Call create(with_sleep_agent=True) first.")
         
         return self._orchestrator.run_consolidation()
+    
+    async def force_consolidation_async(self) -> Optional[Dict[str, Any]]:
+        """Async variant of force_consolidation() (runs in a worker thread)."""
+        return await asyncio.to_thread(self.force_consolidation)
 
     def chat_stream(self, message: str):
         """
@@ -1039,20 +1781,29 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             message: The message to send.
 
         Yields:
-            Chunks of the response.
+            Chunks of the response. Use collect_stream() to assemble
+            them into a single string.
         """
         if not self.is_created:
             self.create()
 
         try:
-            response = self._client.agents.messages.create(
+            response = self._client.agents.messages.stream(
                 agent_id=self._agent_id,
                 messages=[{'role': 'user', 'content': message}],
-                stream=True
+                stream_tokens=True
             )
+            # Reasoning, tool and usage chunks carry no reply text
             for chunk in response:
-                if chunk and hasattr(chunk, 'delta') and chunk.delta:
-                    yield chunk.delta
+                if getattr(chunk, 'message_type', None) == "assistant_message":
+                    content = chunk.content
+                    if content and isinstance(content, str):
+                        yield content
+            
+            # Same bookkeeping as chat(); consolidation runs in the background
+            self._invalidate_blocks_cache()
+            if self.is_sleep_enabled:
+                self._orchestrator.on_message(1)
         except Exception as e:
             raise RuntimeError(f"Failed to stream message: {e}") from e
 
@@ -1068,30 +1819,27 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             limit: Maximum size in characters.
 
         Returns:
-            True if successful.
+            True if successful, False if the agent has no block with that
+            label (blocks are created via create()).
         """
         if not self.is_created:
             raise RuntimeError("Agent not created. Call create() first.")
 
         try:
-            # Try to retrieve existing block by label
-            try:
-                existing = self._client.agents.blocks.retrieve(
-                    agent_id=self._agent_id,
-                    block_label=key
-                )
-                # Update existing block
-                self._client.agents.blocks.update(
-                    agent_id=self._agent_id,
-                    block_id=existing.id,
-                    value=value
-                )
-            except Exception:
-                # Block doesn't exist, create new one (blocks are created via create() with label)
-                pass
-            return True
+            # Update the block in place by label (blocks are created via create())
+            self._client.agents.blocks.update(
+                block_label=key,
+                agent_id=self._agent_id,
+                value=value
+            )
         except Exception as e:
+            # Unknown label: nothing was written
+            if getattr(e, 'status_code', None) == 404:
+                return False
             raise RuntimeError(f"Failed to set core memory: {e}") from e
+        finally:
+            self._invalidate_blocks_cache()
+        return True
 
     def memory_core_get(self, key: str) -> Optional[Dict[str, Any]]:
         """
@@ -1106,18 +1854,29 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         if not self.is_created:
             raise RuntimeError("Agent not created. Call create() first.")
 
-        try:
-            blocks = self._client.agents.blocks.list(agent_id=self._agent_id)
-            for block in blocks:
-                if block.label == key:
-                    return {
-                        'id': block.id,
-                        'name': block.label,
-                        'value': block.value
-                    }
+        blocks = self._fresh_blocks()
+        if blocks is not None:
+            block = blocks.get(key)
+        else:
+            # No fresh block list: fetch just this block by label
+            try:
+                block = self._client.agents.blocks.retrieve(
+                    agent_id=self._agent_id,
+                    block_label=key
+                )
+            except Exception as e:
+                # Unknown label: the server answers 404
+                if getattr(e, 'status_code', None) == 404:
+                    return None
+                raise RuntimeError(f"Failed to get core memory: {e}") from e
+
+        if not block:
             return None
-        except Exception as e:
-            raise RuntimeError(f"Failed to get core memory: {e}") from e
+        return {
+            'id': block.id,
+            'name': block.label,
+            'value': block.value
+        }
 
     def memory_core_list(self) -> List[Dict[str, Any]]:
         """
@@ -1130,23 +1889,26 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
             raise RuntimeError("Agent not created. Call create() first.")
 
         try:
-            blocks = self._client.agents.blocks.list(agent_id=self._agent_id)
-            return [
-                {'id': b.id, 'name': b.label, 'value': b.value}
-                for b in blocks
-            ]
+            blocks = self._get_blocks()
         except Exception as e:
             raise RuntimeError(f"Failed to list core memory: {e}") from e
+        return [
+            {'id': b.id, 'name': b.label, 'value': b.value}
+            for b in blocks.values()
+        ]
 
     def memory_core_clear(self, key: str) -> bool:
         """
-        Clear/delete a core memory block.
+        Clear a core memory block from this agent.
+
+        The block is detached from the agent, not deleted: blocks can be
+        shared with other agents, which keep it.
 
         Args:
-            key: Name/identifier of the block to delete.
+            key: Name/identifier of the block to remove.
 
         Returns:
-            True if deleted, False if not found.
+            True if detached, False if not found.
         """
         if not self.is_created:
             raise RuntimeError("Agent not created. Call create() first.")
@@ -1154,14 +1916,37 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         try:
             block = self.memory_core_get(key)
             if block:
-                self._client.memory.blocks.delete(
-                    agent_id=self._agent_id,
-                    block_id=block['id']
-                )
+                self._client.agents.blocks.detach(block['id'], agent_id=self._agent_id)
                 return True
             return False
         except Exception as e:
             raise RuntimeError(f"Failed to clear core memory: {e}") from e
+        finally:
+            self._invalidate_blocks_cache()
+
+    def _fresh_blocks(self) -> Optional[Dict[str, Any]]:
+        """Cached blocks by label, or None when absent or older than _BLOCKS_TTL."""
+        cached = self._blocks_cache
+        if cached is not None and time.monotonic() - cached[0] < self._BLOCKS_TTL:
+            return cached[1]
+        return None
+
+    def _get_blocks(self) -> Dict[str, Any]:
+        """Core memory blocks by label, re-fetched after _BLOCKS_TTL seconds."""
+        blocks = self._fresh_blocks()
+        if blocks is not None:
+            return blocks
+        blocks = {
+            b.label: b
+            for b in self._client.agents.blocks.list(agent_id=self._agent_id)
+        }
+        self._blocks_cache = (time.monotonic(), blocks)
+        return blocks
+
+    def _invalidate_blocks_cache(self):
+        """Drop cached core memory blocks (call after any block change)."""
+        for agent in self._block_peers or (self,):
+            agent._blocks_cache = None
 
     # ==================== Archival Memory ====================
 
@@ -1436,8 +2221,13 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
         """
         try:
             self._ensure_client()
-            # Simple check - try to list agents
-            agents = self._client.agents.list()
+            # Liveness endpoint: no agent query on the server
+            health = getattr(self._client, 'health', None)
+            if callable(health):
+                health(timeout=5.0)
+            else:
+                # Older SDKs: smallest possible agent listing
+                self._client.agents.list(limit=1)
             return True
         except Exception:
             return False
@@ -1454,6 +2244,7 @@ I tuoi valori fondamentali: crescita, curiosità, autenticità, autonomia.""",
                 self._client.agents.delete(agent_id=self._agent_id)
             self._agent = None
             self._agent_id = None
+            self._invalidate_sleep_cache()
             self.create()
             return True
         except Exception as e:
@@ -1489,6 +2280,162 @@ def create_scarlet(
     return agent
 
 
+def collect_stream(agent: ScarletAgent, message: str) -> str:
+    """
+    Send a streaming message and return the full response text.
+
+    Chunks are written to a single buffer instead of concatenated with
+    ``+=``, so long responses are assembled in linear time.
+
+    Args:
+        agent: ScarletAgent instance.
+        message: The message to send.
+
+    Returns:
+        The complete response as string.
+    """
+    buf = io.StringIO()
+    for chunk in agent.chat_stream(message):
+        buf.write(chunk)
+    return buf.getvalue()
+
+
+class _PooledAgent:
+    """State shared by the pooled wrappers of one Letta agent."""
+    
+    __slots__ = ("lock", "sleep_agent", "orchestrator", "wrappers")
+    
+    def __init__(self, agent: ScarletAgent):
+        self.lock = threading.Lock()
+        self.sleep_agent = agent._sleep_agent
+        self.orchestrator = agent._orchestrator
+        # Live wrappers; each one's _block_peers is this same list, so a
+        # block change through any of them drops every cached copy
+        self.wrappers: List[ScarletAgent] = [agent]
+        agent._block_peers = self.wrappers
+
+
+class ScarletAgentPool:
+    """
+    Pool of ready ScarletAgent wrappers for server deployments.
+    
+    Setting up a ScarletAgent costs several Letta round-trips (agent and
+    sleep agent lookup), so a request handler should borrow one from the
+    pool instead of calling create_scarlet() per request:
+    
+        pool = ScarletAgentPool(max_size=8)
+        with pool.agent() as scarlet:
+            reply = scarlet.chat(message)
+    
+    At most ``max_size`` wrappers exist at once; further callers block
+    until one is released. Wrappers idle for more than ``max_idle``
+    seconds are dropped locally but never deleted on the server.
+    
+    Wrappers that point at the same Letta agent (the default factory
+    always returns the agent named in ScarletConfig) share one sleep
+    agent and one orchestrator, so the message count, the consolidation
+    cycle and the state file stay single per agent, and a block change
+    through any of them invalidates the block cache of all. Borrowers of
+    the same Letta agent are also served one at a time, since concurrent
+    chats would interleave in its one conversation. For parallel
+    conversations the factory must return distinct Letta agents (e.g. one
+    per user).
+    """
+    
+    def __init__(
+        self,
+        factory: Optional[Callable[[], ScarletAgent]] = None,
+        max_size: int = 8,
+        max_idle: float = 300.0
+    ):
+        """
+        Initialize the pool.
+        
+        Args:
+            factory: Returns a created ScarletAgent (default: create_scarlet)
+            max_size: Maximum number of agents handed out at once
+            max_idle: Seconds an unused agent is kept before being dropped
+        """
+        self._factory = factory or create_scarlet
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle: deque = deque()  # (released_at, agent), newest last
+        self._shared: Dict[str, _PooledAgent] = {}  # Letta agent id -> shared state
+        self._lock = threading.Lock()
+        self._max_idle = max_idle
+    
+    @contextmanager
+    def agent(self):
+        """Borrow an agent for the duration of the ``with`` block."""
+        self._slots.acquire()
+        try:
+            agent = self._take_idle() or self._adopt(self._factory())
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            with self._shared[agent._agent_id].lock:
+                yield agent
+        finally:
+            with self._lock:
+                self._idle.append((time.monotonic(), agent))
+            self._slots.release()
+    
+    def _adopt(self, agent: ScarletAgent) -> ScarletAgent:
+        """Register a new wrapper, attaching the shared state of its Letta agent."""
+        with self._lock:
+            shared = self._shared.get(agent._agent_id)
+            if shared is None:
+                self._shared[agent._agent_id] = _PooledAgent(agent)
+                return agent
+            shared.wrappers.append(agent)
+            own = agent._orchestrator
+            agent._sleep_agent = shared.sleep_agent
+            agent._orchestrator = shared.orchestrator
+            agent._block_peers = shared.wrappers
+        if own is not None and own is not shared.orchestrator:
+            own.shutdown(wait=False)
+        return agent
+    
+    def _take_idle(self) -> Optional[ScarletAgent]:
+        """Pop the most recently used idle agent, dropping expired ones."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._idle and now - self._idle[0][0] > self._max_idle:
+                expired.append(self._idle.popleft()[1])
+            agent = self._idle.pop()[1] if self._idle else None
+        for stale in expired:
+            self._discard(stale)
+        return agent
+    
+    def _discard(self, agent: ScarletAgent):
+        """
+        Release a wrapper's local resources (the server agent is kept).
+        
+        The shared orchestrator is shut down with the last wrapper of its
+        Letta agent.
+        """
+        with self._lock:
+            shared = self._shared.get(agent._agent_id)
+            if shared is None:
+                return
+            # By identity: wrappers of one agent may compare equal
+            shared.wrappers[:] = [w for w in shared.wrappers if w is not agent]
+            agent._block_peers = None
+            if shared.wrappers:
+                return
+            del self._shared[agent._agent_id]
+        if shared.orchestrator is not None:
+            shared.orchestrator.shutdown(wait=False)
+    
+    def close(self):
+        """Drop all idle agents."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for _, agent in idle:
+            self._discard(agent)
+
+
 # ==================== Main ====================
 
 if __name__ == "__main__":
@@ -1499,11 +2446,17 @@ if __name__ == "__main__":
     parser.add_argument("--test", action="store_true", help="Run simple test message")
     args = parser.parse_args()
     
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
     print("=" * 60)
     print("Scarlet Agent - Initialization Test")
     print("=" * 60)
 
     # Check environment
+    _ensure_env()
     api_key = os.getenv("MINIMAX_API_KEY")
     if not api_key or api_key == "your_minimax_api_key_here":
         print("WARNING: MINIMAX_API_KEY not configured in .env")
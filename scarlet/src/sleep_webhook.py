@@ -33,11 +33,20 @@ Environment Variables:
 - LETTA_URL: Letta server URL (default: http://localhost:8283)
 - SLEEP_THRESHOLD: Messages before consolidation (default: 5)
 - SLEEP_WEBHOOK_PORT: Port for this service (default: 8284)
+- WEBHOOK_WORKERS: uvicorn worker processes (default: 1; >1 needs REDIS_HOST)
 - STEP_COMPLETE_KEY: Optional auth key for webhook
 - RETRIEVAL_ENABLED: Enable auto retrieval (default: true)
 - RETRIEVAL_LIMIT: Max memories per collection (default: 3)
 - RETRIEVAL_THRESHOLD: Min similarity score (default: 0.5)
+- QDRANT_PREFER_GRPC / QDRANT_GRPC_PORT: Search Qdrant over gRPC (default: false / 6334)
+- SESSION_BLOCK_TTL: Seconds the session_context block is written without re-reading it (default: 30)
+- LAST_MESSAGE_TTL: Seconds the last user message is reused across steps, even if a newer one arrived (default: 2; 0 disables)
+- EMBEDDING_CACHE_SIZE: Message embeddings kept in memory (default: 2048)
 - DECAY_INTERVAL_HOURS: Hours between decay cycles (default: 1)
+- REDIS_HOST / REDIS_PORT: Share message counters across workers (optional)
+- SLEEP_COUNTER_TTL: Seconds an idle Redis counter is kept (default: 3600)
+- CONSOLIDATION_WORKERS: Concurrent consolidations (default: 4)
+- CONSOLIDATION_QUEUE_SIZE: Max pending consolidations (default: 64)
 
 Version: 2.2.0
 Author: ABIOGENESIS Team
@@ -45,12 +54,18 @@ Date: 2026-02-01
 """
 
 import os
+import re
 import sys
 from pathlib import Path
+import hmac
+import hashlib
 import json
 import asyncio
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Optional, Any, List, Tuple
+from typing import Dict, Optional, Any, List, Set, Tuple, Union
 from dataclasses import dataclass, field
 import logging
 
@@ -69,12 +84,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 from fastapi import FastAPI, HTTPException, Header, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError, field_validator
 import httpx
 
 # Import memory system for Qdrant storage
 try:
-    from memory.memory_blocks import MemoryManager
+    from memory.memory_blocks import (
+        MemoryManager,
+        EpisodicMemoryBlock,
+        SemanticMemoryBlock,
+        ProceduralMemoryBlock,
+        EmotionalMemoryBlock,
+    )
     from memory.qdrant_manager import get_manager
     MEMORY_AVAILABLE = True
     logger.info("[Sleep-Webhook] Memory system available")
@@ -91,11 +112,44 @@ except ImportError as e:
     logger.warning(f"[Sleep-Webhook] Decay system not available: {e}")
     DECAY_AVAILABLE = False
 
+# Optional orjson/h2, detected once (see speedups.py)
+from speedups import HTTP2_AVAILABLE, json_dumps as _json_dumps, json_loads as _json_loads
+
+# Headers for request bodies serialized with _json_dumps
+JSON_HEADERS = {"content-type": "application/json"}
+
+# Optional Redis for counters shared across uvicorn workers
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Optional gRPC transport for retrieval searches (QDRANT_PREFER_GRPC)
+try:
+    from qdrant_client import AsyncQdrantClient
+    from qdrant_client.http.exceptions import UnexpectedResponse
+    import grpc
+    QDRANT_CLIENT_AVAILABLE = True
+except ImportError:
+    QDRANT_CLIENT_AVAILABLE = False
+
+
+def _collection_missing(e: Exception) -> bool:
+    """True when a qdrant-client error means the collection does not exist (REST or gRPC)."""
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code == 404
+    if isinstance(e, grpc.aio.AioRpcError):
+        return e.code() == grpc.StatusCode.NOT_FOUND
+    return False
+
 # Configuration
 LETTA_URL = os.getenv("LETTA_URL", "http://localhost:8283")
 SLEEP_THRESHOLD = int(os.getenv("SLEEP_THRESHOLD", "5"))
 SLEEP_WEBHOOK_PORT = int(os.getenv("SLEEP_WEBHOOK_PORT", "8284"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
 WEBHOOK_KEY = os.getenv("STEP_COMPLETE_KEY", "")
+WEBHOOK_KEY_BYTES = WEBHOOK_KEY.encode()
 
 # Automatic Memory Retrieval Configuration
 RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
@@ -104,6 +158,77 @@ RETRIEVAL_THRESHOLD = float(os.getenv("RETRIEVAL_THRESHOLD", "0.5"))  # Min simi
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
 QDRANT_HOST = os.getenv("QDRANT_HOST", "qdrant")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+SESSION_BLOCK_TTL = float(os.getenv("SESSION_BLOCK_TTL", "30"))  # Seconds a session_context block is reused
+LAST_MESSAGE_TTL = float(os.getenv("LAST_MESSAGE_TTL", "2.0"))  # Seconds a fetched user message is reused
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))  # Cached message vectors
+
+# Shared counters (empty REDIS_HOST = per-process counters)
+REDIS_HOST = os.getenv("REDIS_HOST", "")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+COUNTER_TTL = int(os.getenv("SLEEP_COUNTER_TTL", "3600"))  # Seconds
+
+# Base URL of each upstream service's shared client (see get_http_client)
+SERVICE_URLS = {
+    "letta": LETTA_URL,
+    "ollama": OLLAMA_URL,
+    "qdrant": f"http://{QDRANT_HOST}:{QDRANT_PORT}",
+}
+
+# Background consolidation limits
+CONSOLIDATION_WORKERS = int(os.getenv("CONSOLIDATION_WORKERS", "4"))  # Concurrent runs
+CONSOLIDATION_QUEUE_SIZE = int(os.getenv("CONSOLIDATION_QUEUE_SIZE", "64"))  # Pending runs
+
+# Messages sent to the sleep agent per consolidation
+HISTORY_LIMIT = 20
+
+# Static parts of the consolidation prompt; only the history varies
+PROMPT_PREFIX = """Sei Scarlet-Sleep, un agente specializzato per il consolidamento della memoria.
+
+ANALISI: Analizza la cronologia e genera insights JSON strutturati.
+
+CRONOLOGIA:
+"""
+PROMPT_SUFFIX = """
+
+OUTPUT JSON:
+{
+    "persona_updates": ["insight su Scarlet"],
+    "human_updates": ["info sull umano"],
+    "goals_insights": ["progressi verso obiettivi"],
+    "key_events": [{"description": "evento significativo", "importance": 0.8}],
+    "reflection": "sintesi dei pattern emersi",
+    "priority_score": 0.7
+}
+
+REGOLE: Non inventare info. Solo JSON, no markdown. Sii specifico e conciso."""
+
+# Role prefixes used in the consolidation transcript
+ROLE_LABELS = {"user": "USER", "assistant": "ASSISTANT", "system": "SYSTEM", "tool": "TOOL"}
+
+# Emotion keywords for sleep-time reflections, checked in priority order
+EMOTION_PATTERNS = (
+    ("curiosity", re.compile(r"curioso|interessato|curious", re.IGNORECASE)),
+    ("satisfaction", re.compile(r"positivo|soddisfatto|bene", re.IGNORECASE)),
+    ("challenge", re.compile(r"difficile|problema|frustrato", re.IGNORECASE)),
+)
+
+# Labels for retrieved memories in session_context, and how many are shown
+MEMORY_TYPE_LABELS = {
+    "episodes": "EPISODIO",
+    "concepts": "CONCETTO",
+    "skills": "ABILITÀ",
+    "emotions": "EMOZIONE",
+}
+MAX_CONTEXT_MEMORIES = 8  # Avoids context bloat
+
+# [RICORDI EMERGENTI] section of session_context: up to the base footer text
+# ("Il contesto della sessione...") or the end of the block
+_RICORDI_RE = re.compile(r'\[RICORDI EMERGENTI\].*?(?=Il contesto della sessione|$)', re.DOTALL)
+
+# Decoder reused for sleep agent responses
+_JSON_DECODER = json.JSONDecoder()
 
 # Official Agent IDs
 PRIMARY_AGENT_ID = "agent-ac26cf86-3890-40a9-a70f-967f05115da9"
@@ -111,10 +236,174 @@ SLEEP_AGENT_ID = "agent-3dd9a54f-dc55-4d7f-adc3-d5cbb1aca950"
 
 app = FastAPI(title="Sleep-Time Webhook Service v2.2")
 
-# In-memory message counter per conversation
-conversation_counters: Dict[str, int] = {}
-last_consolidation: Dict[str, str] = {}
-last_retrieval: Dict[str, str] = {}  # Track last retrieval time
+class ExpiringDict(OrderedDict):
+    """
+    Dict that forgets keys not written for `ttl` seconds.
+    
+    Keys are kept in write order, so expiry and the `maxsize` bound only
+    ever look at the oldest entries. Reads (`[]`, `get`, `in`) also drop
+    an expired key, so a stale entry is never returned.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._written: Dict[Any, float] = {}
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        self._written[key] = time.monotonic()
+        self.purge()
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._written.pop(key, None)
+    
+    def _expire(self, key) -> bool:
+        """Drop key if its TTL has passed; True when it was dropped."""
+        written = self._written.get(key)
+        if written is None or time.monotonic() - written < self.ttl:
+            return False
+        del self[key]
+        return True
+    
+    def __getitem__(self, key):
+        if self._expire(key):
+            raise KeyError(key)
+        return super().__getitem__(key)
+    
+    def __contains__(self, key):
+        return not self._expire(key) and super().__contains__(key)
+    
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+    
+    def pop(self, key, *default):
+        self._written.pop(key, None)
+        return super().pop(key, *default)
+    
+    def clear(self):
+        super().clear()
+        self._written.clear()
+    
+    def purge(self):
+        """Drop expired entries and anything beyond maxsize."""
+        cutoff = time.monotonic() - self.ttl
+        while self:
+            oldest = next(iter(self))
+            if len(self) <= self.maxsize and self._written[oldest] >= cutoff:
+                break
+            del self[oldest]
+
+
+# In-memory state per conversation (bounded, idle conversations expire)
+conversation_counters: Dict[str, int] = ExpiringDict(maxsize=10_000, ttl=24 * 3600)
+last_consolidation: Dict[str, str] = ExpiringDict(maxsize=10_000, ttl=7 * 24 * 3600)
+last_retrieval: Dict[str, str] = ExpiringDict(maxsize=10_000, ttl=24 * 3600)  # Track last retrieval time
+
+# Last user message per agent: (fetch time, content), reused within a turn
+_last_message_cache: Dict[str, Tuple[float, str]] = ExpiringDict(maxsize=10_000, ttl=LAST_MESSAGE_TTL)
+
+# session_context block per agent: (fetch time, block id, value last written)
+_session_blocks: Dict[str, Tuple[float, str, str]] = ExpiringDict(maxsize=10_000, ttl=SESSION_BLOCK_TTL)
+
+# Digest of the memories last written to each agent's session_context
+_last_memories_hash: Dict[str, str] = ExpiringDict(maxsize=10_000, ttl=3600)
+
+# Message embeddings by SHA-256 of the stripped, lowercased text (repeated
+# messages skip Ollama); expiry runs in write order, reads do not reorder
+_embedding_cache: Dict[str, List[float]] = ExpiringDict(maxsize=EMBEDDING_CACHE_SIZE, ttl=7 * 24 * 3600)
+
+# Redis client, set at startup when REDIS_HOST is configured
+_redis: Optional[Any] = None
+
+# Async Qdrant gRPC client, set at startup when QDRANT_PREFER_GRPC is enabled
+_qdrant: Optional[Any] = None
+
+# Pending background consolidations and their concurrency limit
+_consolidation_tasks: Set[asyncio.Task] = set()
+_consolidation_slots: Optional[asyncio.Semaphore] = None
+
+# Running retrieval per agent, joined by concurrent steps
+_retrievals_inflight: Dict[str, asyncio.Task] = {}
+
+# Shared keep-alive clients, one per upstream service (see get_http_client)
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(service: str) -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client for an upstream service ("letta", "ollama",
+    "qdrant").
+    
+    One pooled client per service for the whole process, so consecutive
+    calls reuse connections instead of opening a new one per request.
+    The client is bound to the service's base URL, so requests pass only
+    the path. Timeouts are passed per request.
+    """
+    client = _http_clients.get(service)
+    if client is None or client.is_closed:
+        client = _http_clients[service] = httpx.AsyncClient(
+            base_url=SERVICE_URLS[service],
+            follow_redirects=True,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(120.0, connect=5.0),
+        )
+    return client
+
+
+def get_letta_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for Letta."""
+    return get_http_client("letta")
+
+
+# Increment, threshold check and reset in one atomic step: no other
+# worker's INCR can land between the check and the reset
+# KEYS[1] = counter, ARGV[1] = threshold, ARGV[2] = TTL; returns {count, claimed}
+_COUNT_STEP_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count >= tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[1])
+    return {count, 1}
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return {count, 0}
+"""
+
+
+async def count_step(conversation_id: str) -> Tuple[int, bool]:
+    """
+    Count one step for a conversation.
+    
+    With Redis the counter is shared by every worker: a Lua script
+    increments it and, at the threshold, resets it atomically, so exactly
+    one worker triggers consolidation and no step is lost.
+    Without Redis (or if it fails) the in-memory counter is used.
+    
+    Returns:
+        (count, should_consolidate); the counter is reset when True.
+    """
+    if _redis is not None:
+        key = f"sleep:cnt:{conversation_id}"
+        try:
+            count, claimed = await _redis.eval(_COUNT_STEP_LUA, 1, key, SLEEP_THRESHOLD, COUNTER_TTL)
+            count, claimed = int(count), bool(claimed)
+            
+            # Local mirror for /status and /health
+            conversation_counters[conversation_id] = 0 if claimed else count
+            return count, claimed
+        except Exception as e:
+            logger.warning(f"[Sleep-Webhook] Redis counter failed, using local counter: {e}")
+    
+    count = conversation_counters.get(conversation_id, 0) + 1
+    if count >= SLEEP_THRESHOLD:
+        conversation_counters[conversation_id] = 0
+        return count, True
+    conversation_counters[conversation_id] = count
+    return count, False
 
 
 # ==============================================================================
@@ -125,34 +414,47 @@ async def get_last_user_message(agent_id: str) -> Optional[str]:
     """
     Fetch the last user message from Letta API.
     
+    Steps of the same turn within LAST_MESSAGE_TTL reuse the previous
+    result instead of calling Letta again. The reuse is blind: a new user
+    message sent within the TTL is not seen, and retrieval runs on the
+    previous one until the TTL passes. Checking the newest message id
+    would cost the same round trip as the fetch, so this staleness is
+    accepted; set LAST_MESSAGE_TTL=0 to always fetch.
+    
     Returns:
         The content of the last user message, or None if not found.
     """
+    cached = _last_message_cache.get(agent_id)
+    if cached is not None and time.monotonic() - cached[0] < LAST_MESSAGE_TTL:
+        return cached[1]
+    
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=10.0) as client:
-            response = await client.get(
-                f"{LETTA_URL}/v1/agents/{agent_id}/messages",
-                params={"limit": 10}
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Handle response format: {"value": [...], "Count": N}
-            messages = data if isinstance(data, list) else data.get("value", [])
-            
-            if isinstance(messages, list):
-                # Find last user message (message_type == "user_message")
-                for msg in reversed(messages):
-                    if isinstance(msg, dict):
-                        msg_type = msg.get("message_type", "")
-                        if msg_type == "user_message":
-                            content = msg.get("content", "") or msg.get("text", "")
-                            if content:
-                                logger.debug(f"[Retrieval] Found user message: {content[:50]}...")
-                                return content
-            
-            logger.debug("[Retrieval] No user message found in last 10 messages")
-            return None
+        client = get_letta_client()
+        response = await client.get(
+            f"/v1/agents/{agent_id}/messages",
+            params={"limit": 10},
+            timeout=10.0
+        )
+        response.raise_for_status()
+        data = _json_loads(response.content)
+        
+        # Handle response format: {"value": [...], "Count": N}
+        messages = data if isinstance(data, list) else data.get("value", [])
+        
+        if isinstance(messages, list):
+            # Find last user message (message_type == "user_message")
+            for msg in reversed(messages):
+                if isinstance(msg, dict):
+                    msg_type = msg.get("message_type", "")
+                    if msg_type == "user_message":
+                        content = msg.get("content", "") or msg.get("text", "")
+                        if content:
+                            logger.debug("[Retrieval] Found user message: %.50s...", content)
+                            _last_message_cache[agent_id] = (time.monotonic(), content)
+                            return content
+        
+        logger.debug("[Retrieval] No user message found in last 10 messages")
+        return None
     except Exception as e:
         logger.error(f"[Retrieval] Error fetching last message: {e}")
         return None
@@ -162,67 +464,108 @@ async def generate_embedding(text: str) -> Optional[List[float]]:
     """
     Generate embedding via Ollama BGE-m3.
     
-    ~20ms warm, returns 1024-dimension vector.
+    ~20ms warm, returns 1024-dimension vector. Repeated messages (ignoring
+    case and surrounding whitespace) are served from an in-memory TTL
+    cache without calling Ollama.
     """
+    text = text.strip()
+    key = hashlib.sha256(text.lower().encode()).hexdigest()
+    cached = _embedding_cache.get(key)
+    if cached is not None:
+        logger.debug("[Retrieval] Embedding cache hit")
+        return cached
+    
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{OLLAMA_URL}/api/embeddings",
-                json={
-                    "model": "bge-m3",
-                    "prompt": text
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            embedding = data.get("embedding", [])
-            
-            if embedding:
-                logger.debug(f"[Retrieval] Generated embedding ({len(embedding)} dims)")
-                return embedding
-            return None
+        client = get_http_client("ollama")
+        response = await client.post(
+            "/api/embeddings",
+            content=_json_dumps({
+                "model": "bge-m3",
+                "prompt": text
+            }),
+            headers=JSON_HEADERS,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        data = _json_loads(response.content)
+        embedding = data.get("embedding", [])
+        
+        if embedding:
+            logger.debug("[Retrieval] Generated embedding (%d dims)", len(embedding))
+            _embedding_cache[key] = embedding
+            return embedding
+        return None
     except Exception as e:
         logger.error(f"[Retrieval] Embedding error: {e}")
         return None
 
 
+def _search_body(vector: List[float], limit: int, score_threshold: float) -> bytes:
+    """Encode a Qdrant REST search request."""
+    return _json_dumps({
+        "vector": vector,
+        "limit": limit,
+        "score_threshold": score_threshold,
+        "with_payload": True
+    })
+
+
 async def search_qdrant_collection(
     collection_name: str,
     vector: List[float],
     limit: int = 3,
-    score_threshold: float = 0.5
+    score_threshold: float = 0.5,
+    body: Optional[bytes] = None
 ) -> List[Tuple[Dict, float]]:
     """
     Search a single Qdrant collection.
     
+    Uses the gRPC client when QDRANT_PREFER_GRPC is enabled, the REST
+    API otherwise. `body` is a pre-encoded REST request (see
+    search_all_collections); it is built from the arguments when omitted.
+    
     Returns list of (payload, score) tuples.
     """
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"http://{QDRANT_HOST}:{QDRANT_PORT}/collections/{collection_name}/points/search",
-                json={
-                    "vector": vector,
-                    "limit": limit,
-                    "score_threshold": score_threshold,
-                    "with_payload": True
-                }
+    if _qdrant is not None:
+        try:
+            response = await _qdrant.query_points(
+                collection_name=collection_name,
+                query=vector,
+                limit=limit,
+                score_threshold=score_threshold,
+                with_payload=True,
             )
-            
-            if response.status_code == 404:
-                logger.debug(f"[Retrieval] Collection {collection_name} not found")
+            return [(point.payload or {}, point.score) for point in response.points]
+        except Exception as e:
+            if _collection_missing(e):
+                logger.debug("[Retrieval] Collection %s not found", collection_name)
                 return []
-                
-            response.raise_for_status()
-            data = response.json()
-            
-            results = []
-            for point in data.get("result", []):
-                payload = point.get("payload", {})
-                score = point.get("score", 0.0)
-                results.append((payload, score))
+            logger.error(f"[Retrieval] Qdrant search error ({collection_name}): {e}")
+            return []
+    
+    try:
+        client = get_http_client("qdrant")
+        response = await client.post(
+            f"/collections/{collection_name}/points/search",
+            content=body or _search_body(vector, limit, score_threshold),
+            headers=JSON_HEADERS,
+            timeout=10.0
+        )
+        
+        if response.status_code == 404:
+            logger.debug("[Retrieval] Collection %s not found", collection_name)
+            return []
             
-            return results
+        response.raise_for_status()
+        data = _json_loads(response.content)
+        
+        results = []
+        for point in data.get("result", []):
+            payload = point.get("payload", {})
+            score = point.get("score", 0.0)
+            results.append((payload, score))
+        
+        return results
     except Exception as e:
         logger.error(f"[Retrieval] Qdrant search error ({collection_name}): {e}")
         return []
@@ -242,9 +585,12 @@ async def search_all_collections(
     """
     collections = ["episodes", "concepts", "skills", "emotions"]
     
+    # The request is identical for every collection: encode the vector once
+    body = None if _qdrant is not None else _search_body(vector, limit, score_threshold)
+    
     # Search all collections in parallel
     tasks = [
-        search_qdrant_collection(col, vector, limit, score_threshold)
+        search_qdrant_collection(col, vector, limit, score_threshold, body)
         for col in collections
     ]
     
@@ -269,108 +615,120 @@ def format_memories_for_context(memories: Dict[str, List[Tuple[Dict, float]]]) -
     Creates a human-readable summary of relevant memories.
     """
     lines = []
-    total_memories = 0
     
     for collection, results in memories.items():
-        if not results:
-            continue
-            
+        # Format based on collection type
+        type_label = MEMORY_TYPE_LABELS.get(collection) or collection.upper()
+        
         for payload, score in results:
+            if len(lines) == MAX_CONTEXT_MEMORIES:
+                return "\n".join(lines)
+            
             title = payload.get("title", "Memory")[:40]
             content = payload.get("content", "")[:100]
-            
-            # Truncate if too long
-            if len(content) > 100:
-                content = content[:97] + "..."
-            
-            # Format based on collection type
-            type_label = {
-                "episodes": "EPISODIO",
-                "concepts": "CONCETTO", 
-                "skills": "ABILITÀ",
-                "emotions": "EMOZIONE"
-            }.get(collection, collection.upper())
-            
             lines.append(f"• [{type_label}] {title}: {content}")
-            total_memories += 1
     
-    if not lines:
-        return ""
+    return "\n".join(lines)
+
+
+async def _fetch_session_block(client: httpx.AsyncClient, agent_id: str) -> Optional[Tuple[str, str]]:
+    """Look up the agent's session_context block; returns (block_id, value)."""
+    response = await client.get(
+        f"/v1/agents/{agent_id}/core-memory/blocks",
+        timeout=15.0
+    )
+    response.raise_for_status()
+    data = _json_loads(response.content)
     
-    return "\n".join(lines[:8])  # Max 8 memories to avoid context bloat
+    # Handle both list and dict with "value" key
+    blocks = data if isinstance(data, list) else data.get("value", [])
+    
+    for block in blocks:
+        if block.get("label") == "session_context":
+            return block.get("id"), block.get("value", "")
+    return None
+
+
+def _render_session_context(current_value: str, memories_text: str) -> str:
+    """Insert or replace the [RICORDI EMERGENTI] section of session_context."""
+    timestamp = time.strftime("%H:%M:%S")
+    
+    # Create the new memories section
+    new_memories_section = f"""[RICORDI EMERGENTI] (aggiornato: {timestamp})
+{memories_text}
+"""
+    
+    if "[RICORDI EMERGENTI]" in current_value:
+        # Replace existing section - capture until the base footer text
+        new_value = _RICORDI_RE.sub(new_memories_section + "\n", current_value)
+    else:
+        # Add new section at the beginning
+        new_value = f"""{new_memories_section}
+{current_value}"""
+    
+    # Limit total length (keep under 2000 chars)
+    if len(new_value) > 2000:
+        new_value = new_value[:1950] + "\n[...truncated]"
+    return new_value
 
 
 async def update_session_context(agent_id: str, memories_text: str) -> bool:
     """
     Update the session_context memory block with retrieved memories.
     
-    Uses Letta API to modify the memory block.
+    Uses Letta API to modify the memory block. Skipped when the same
+    memories were already written for this agent. Within SESSION_BLOCK_TTL
+    the block id and value from the previous write are reused, so only
+    the PATCH is sent.
     """
     if not memories_text:
         return True  # Nothing to update
     
+    digest = hashlib.blake2b(memories_text.encode(), digest_size=16).hexdigest()
+    if _last_memories_hash.get(agent_id) == digest:
+        logger.debug("[Retrieval] session_context unchanged, skipping update")
+        return True
+    
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=15.0) as client:
-            # First get current memory blocks
-            response = await client.get(
-                f"{LETTA_URL}/v1/agents/{agent_id}/core-memory/blocks"
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Handle both list and dict with "value" key
-            blocks = data if isinstance(data, list) else data.get("value", [])
-            
-            # Find session_context block
-            session_block = None
-            for block in blocks:
-                if block.get("label") == "session_context":
-                    session_block = block
-                    break
-            
-            if not session_block:
-                logger.warning("[Retrieval] session_context block not found")
-                return False
-            
-            block_id = session_block.get("id")
-            current_value = session_block.get("value", "")
-            
-            # Build new value with memories section
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            
-            # Check if there's already a RICORDI EMERGENTI section
-            import re
-            
-            # Create the new memories section
-            new_memories_section = f"""[RICORDI EMERGENTI] (aggiornato: {timestamp})
-{memories_text}
-"""
-            
-            if "[RICORDI EMERGENTI]" in current_value:
-                # Replace existing section - capture until next section or base text
-                # The section ends at: another [SECTION], or the base footer text
-                pattern = r'\[RICORDI EMERGENTI\].*?(?=Il contesto della sessione|$)'
-                new_value = re.sub(pattern, new_memories_section + "\n", current_value, flags=re.DOTALL)
+        client = get_letta_client()
+        cached = _session_blocks.get(agent_id)
+        if cached is not None and time.monotonic() - cached[0] >= SESSION_BLOCK_TTL:
+            cached = None
+        
+        while True:
+            if cached is not None:
+                _, block_id, current_value = cached
             else:
-                # Add new section at the beginning
-                new_value = f"""{new_memories_section}
-{current_value}"""
+                block = await _fetch_session_block(client, agent_id)
+                if block is None:
+                    logger.warning("[Retrieval] session_context block not found")
+                    return False
+                block_id, current_value = block
             
-            # Limit total length (keep under 2000 chars)
-            if len(new_value) > 2000:
-                new_value = new_value[:1950] + "\n[...truncated]"
+            new_value = _render_session_context(current_value, memories_text)
             
             # Update the block using correct Letta API endpoint
             update_response = await client.patch(
-                f"{LETTA_URL}/v1/blocks/{block_id}",
-                json={"value": new_value}
+                f"/v1/blocks/{block_id}",
+                content=_json_dumps({"value": new_value}),
+                headers=JSON_HEADERS,
+                timeout=15.0
             )
-            update_response.raise_for_status()
-            
-            logger.info(f"[Retrieval] Updated session_context ({len(memories_text)} chars)")
-            return True
-            
+            if cached is not None and update_response.status_code in (403, 404):
+                # Block deleted or recreated since it was cached: look it up again
+                cached = None
+                continue
+            break
+        
+        update_response.raise_for_status()
+        _session_blocks[agent_id] = (time.monotonic(), block_id, new_value)
+        _last_memories_hash[agent_id] = digest
+        
+        logger.info(f"[Retrieval] Updated session_context ({len(memories_text)} chars)")
+        return True
+        
     except Exception as e:
+        _session_blocks.pop(agent_id, None)
         logger.error(f"[Retrieval] Error updating session_context: {e}")
         return False
 
@@ -382,10 +740,27 @@ async def perform_automatic_retrieval(agent_id: str) -> Dict[str, Any]:
     This is the main entry point called on every STEP_COMPLETE.
     ADR-005: Now uses Query Analyzer + Multi-Strategy Search.
     
+    Steps arriving while a retrieval for the same agent is still running
+    share its result instead of starting another one.
+    
     Returns:
         Dict with retrieval stats and status.
     """
-    start_time = datetime.now()
+    inflight = _retrievals_inflight.get(agent_id)
+    if inflight is not None:
+        logger.debug("[Retrieval] Joining in-flight retrieval for %s", agent_id)
+        return dict(await asyncio.shield(inflight))
+    
+    task = asyncio.create_task(_run_retrieval(agent_id))
+    _retrievals_inflight[agent_id] = task
+    task.add_done_callback(lambda _: _retrievals_inflight.pop(agent_id, None))
+    # Shielded: a cancelled request must not cancel the run other steps await
+    return await asyncio.shield(task)
+
+
+async def _run_retrieval(agent_id: str) -> Dict[str, Any]:
+    """Run the retrieval pipeline once (see perform_automatic_retrieval)."""
+    start_time = time.perf_counter()
     stats = {
         "success": False,
         "message_found": False,
@@ -404,7 +779,7 @@ async def perform_automatic_retrieval(agent_id: str) -> Dict[str, Any]:
             logger.debug("[Retrieval] No user message found, skipping")
             return stats
         stats["message_found"] = True
-        logger.debug(f"[Retrieval] Message: {message[:50]}...")
+        logger.debug("[Retrieval] Message: %.50s...", message)
         
         # 2. Generate embedding (needed for all strategies)
         embedding = await generate_embedding(message)
@@ -415,10 +790,13 @@ async def perform_automatic_retrieval(agent_id: str) -> Dict[str, Any]:
         
         # 3. ADR-005: Try smart search with Query Analyzer
         try:
-            from memory.memory_retriever import MemoryRetriever
+            from memory.memory_retriever import get_retriever
             
-            retriever = MemoryRetriever()
-            results, metadata = retriever.smart_search(
+            # Reuse the process-wide retriever (its Qdrant client and query
+            # analyzer) and keep its blocking searches off the event loop
+            retriever = get_retriever()
+            results, metadata = await asyncio.to_thread(
+                retriever.smart_search,
                 query=message,
                 query_vector=embedding,
                 limit=RETRIEVAL_LIMIT
@@ -464,8 +842,7 @@ async def perform_automatic_retrieval(agent_id: str) -> Dict[str, Any]:
                 stats["success"] = True
         
         # Track timing
-        duration = (datetime.now() - start_time).total_seconds() * 1000
-        stats["duration_ms"] = round(duration)
+        stats["duration_ms"] = round((time.perf_counter() - start_time) * 1000)
         
         logger.info(f"[Retrieval] Complete in {stats['duration_ms']}ms")
         
@@ -487,52 +864,155 @@ class StepCompletePayload(BaseModel):
     conversation_id: Optional[str] = None
 
 
+class LettaMessage(BaseModel):
+    """Fields of a Letta message used to find the sleep agent's reply."""
+    model_config = ConfigDict(extra="ignore")
+    
+    message_type: str = ""
+    content: Optional[Union[str, List[Any]]] = None
+    assistant_message: Optional[str] = None
+    internal_monologue: Optional[str] = None
+
+
+class LettaMessagesResponse(BaseModel):
+    """Letta send-message response; other fields are skipped."""
+    model_config = ConfigDict(extra="ignore")
+    
+    messages: List[LettaMessage] = []
+
+
+# Compiled once: validates the response straight from bytes
+SLEEP_RESPONSE_ADAPTER = TypeAdapter(Union[LettaMessagesResponse, List[LettaMessage]])
+
+
+def _coerce_score(value: Any) -> float:
+    """Coerce a score to float; missing or non-numeric values become the neutral 0.5."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.5
+
+
+class KeyEvent(BaseModel):
+    """A significant event reported by the sleep agent."""
+    model_config = ConfigDict(extra="ignore")
+    
+    description: str
+    importance: float = 0.5
+    
+    _coerce_importance = field_validator("importance", mode="before")(_coerce_score)
+
+
+class SleepInsights(BaseModel):
+    """
+    Sleep agent insights as consumed by store_insights_to_qdrant.
+    
+    Items that are not usable (events without a description, updates of
+    10 characters or less) are dropped here instead of in each loop, and
+    scores that are not numbers fall back to 0.5, so one malformed field
+    never rejects the whole payload.
+    """
+    model_config = ConfigDict(extra="ignore")
+    
+    key_events: List[KeyEvent] = []
+    human_updates: List[str] = []
+    persona_updates: List[str] = []
+    goals_insights: List[str] = []
+    reflection: Optional[str] = None
+    priority_score: float = 0.5
+    
+    _coerce_priority = field_validator("priority_score", mode="before")(_coerce_score)
+    
+    @field_validator("key_events", mode="before")
+    @classmethod
+    def _usable_events(cls, value: Any) -> List[Any]:
+        if not isinstance(value, list):
+            return []
+        return [
+            e for e in value
+            if isinstance(e, dict) and isinstance(e.get("description"), str) and e["description"]
+        ]
+    
+    @field_validator("human_updates", "persona_updates", "goals_insights", mode="before")
+    @classmethod
+    def _usable_updates(cls, value: Any) -> List[str]:
+        if not isinstance(value, list):
+            return []
+        return [u for u in value if isinstance(u, str) and len(u) > 10]
+    
+    @field_validator("reflection", mode="before")
+    @classmethod
+    def _text_reflection(cls, value: Any) -> Optional[str]:
+        return value if value is None or isinstance(value, str) else ""
+
+
 # Initialize memory manager (singleton) - set at module level
 _memory_manager: Optional[Any] = None  # Type is Any when MemoryManager not available
+_memory_manager_lock = threading.Lock()  # Initialized from worker threads
 
 def get_memory_manager() -> Optional[Any]:
-    """Get or initialize memory manager."""
+    """Get or initialize memory manager (blocking; safe to call from threads)."""
     global _memory_manager
     if not MEMORY_AVAILABLE:
         return None
-    if _memory_manager is None:
-        try:
-            # Import again here to avoid NameError
-            from memory.memory_blocks import MemoryManager
-            _memory_manager = MemoryManager()
-            if _memory_manager.connect_qdrant():
-                logger.info("[Sleep-Webhook] MemoryManager connected to Qdrant")
-            else:
-                logger.warning("[Sleep-Webhook] MemoryManager could not connect to Qdrant")
-        except Exception as e:
-            logger.error(f"[Sleep-Webhook] Failed to initialize MemoryManager: {e}")
-            return None
+    if _memory_manager is not None:
+        return _memory_manager
+    with _memory_manager_lock:
+        if _memory_manager is None:
+            try:
+                # Import again here to avoid NameError
+                from memory.memory_blocks import MemoryManager
+                _memory_manager = MemoryManager()
+                if _memory_manager.connect_qdrant():
+                    logger.info("[Sleep-Webhook] MemoryManager connected to Qdrant")
+                else:
+                    logger.warning("[Sleep-Webhook] MemoryManager could not connect to Qdrant")
+            except Exception as e:
+                logger.error(f"[Sleep-Webhook] Failed to initialize MemoryManager: {e}")
+                return None
     return _memory_manager
 
 
 def parse_sleep_agent_response(response_text: str) -> Dict[str, Any]:
-    """Parse JSON response from sleep agent."""
-    try:
-        # Remove markdown code blocks if present
-        text = response_text.strip()
-        if text.startswith("```"):
-            lines = text.split("\n")
-            text = "\n".join(lines[1:-1])
-        if text.startswith("```json"):
-            lines = text.split("\n")
-            text = "\n".join(lines[1:-1])
-        
-        # Find JSON object
-        start = text.find("{")
-        end = text.rfind("}")
-        
-        if start != -1 and end != -1:
-            json_text = text[start:end+1]
-            return json.loads(json_text)
+    """
+    Parse JSON response from sleep agent.
+    
+    Decodes the first JSON object in the text in a single pass; markdown
+    fences and trailing prose around it are ignored.
+    """
+    start = response_text.find("{")
+    if start == -1:
         return {}
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(response_text, start)
     except json.JSONDecodeError as e:
         logger.warning(f"[Sleep-Webhook] Failed to parse JSON: {e}")
         return {}
+    return obj if isinstance(obj, dict) else {}
+
+
+def extract_assistant_message(messages: List[LettaMessage]) -> str:
+    """
+    Return the sleep agent's reply from a Letta message list.
+    
+    Stops at the first non-empty assistant_message, or at the first
+    internal_monologue that contains a JSON object.
+    """
+    for msg in messages:
+        if msg.message_type == "assistant_message":
+            # Try both 'content' and 'assistant_message' fields
+            content = msg.content if isinstance(msg.content, str) else None
+            content = content or msg.assistant_message
+            if content:
+                return content
+        elif msg.message_type == "internal_monologue":
+            # The reply may end up in the monologue instead
+            monologue = msg.internal_monologue
+            if not monologue and isinstance(msg.content, str):
+                monologue = msg.content
+            if monologue and "{" in monologue and "}" in monologue:
+                return monologue
+    return ""
 
 
 def store_insights_to_qdrant(
@@ -543,105 +1023,101 @@ def store_insights_to_qdrant(
     """
     Store sleep-time insights into Qdrant memory collections.
     
-    Returns dict with counts of stored memories per type.
+    Memories are collected first and written with one upsert per
+    collection instead of one round trip per insight.
+    
+    Returns dict with counts of memories actually stored per type.
     """
     stored = {"episodic": 0, "semantic": 0, "procedural": 0, "emotional": 0}
     
     try:
-        # 1. Store episodic memory from key events
-        key_events = insights.get("key_events", [])
-        if key_events:
-            for event in key_events[:3]:  # Max 3 events
-                if isinstance(event, dict) and event.get("description"):
-                    mem_manager.create_episodic_memory(
-                        title=f"Sleep consolidation: {event['description'][:50]}",
-                        content=event["description"],
-                        event_type="sleep_consolidation",
-                        importance=event.get("importance", 0.5),
-                        tags=["sleep_consolidation", "auto_generated"]
-                    )
-                    stored["episodic"] += 1
-                    logger.info(f"[Sleep-Webhook] Stored episodic: {event['description'][:40]}...")
+        # Validate once; malformed items are dropped by SleepInsights
+        data = SleepInsights.model_validate(insights)
+        
+        episodic: List[EpisodicMemoryBlock] = []
+        semantic: List[SemanticMemoryBlock] = []
+        procedural: List[ProceduralMemoryBlock] = []
+        emotional: List[EmotionalMemoryBlock] = []
+        
+        # 1. Episodic memories from key events
+        for event in data.key_events[:3]:  # Max 3 events
+            episodic.append(EpisodicMemoryBlock(
+                title=f"Sleep consolidation: {event.description[:50]}",
+                content=event.description,
+                event_type="sleep_consolidation",
+                importance=event.importance,
+                tags=["sleep_consolidation", "auto_generated"]
+            ))
+            logger.debug(f"[Sleep-Webhook] Prepared episodic: {event.description[:40]}...")
         
         # If no key events, store conversation summary
-        if stored["episodic"] == 0 and conversation_history:
-            reflection = insights.get("reflection", "Sleep-time consolidation")
-            mem_manager.create_episodic_memory(
+        if not episodic and conversation_history:
+            reflection = "Sleep-time consolidation" if data.reflection is None else data.reflection
+            episodic.append(EpisodicMemoryBlock(
                 title="Sleep consolidation session",
-                content=reflection if reflection else conversation_history[:500],
+                content=reflection or conversation_history[:500],
                 event_type="sleep_consolidation",
-                importance=insights.get("priority_score", 0.5),
+                importance=data.priority_score,
                 tags=["sleep_consolidation", "auto_generated"]
-            )
-            stored["episodic"] = 1
+            ))
         
-        # 2. Store semantic memories from human_updates (facts about human)
-        human_updates = insights.get("human_updates", [])
-        for update in human_updates[:3]:
-            if update and isinstance(update, str) and len(update) > 10:
-                mem_manager.create_semantic_memory(
-                    title=f"Human info: {update[:30]}",
-                    content=update,
-                    concept_category="human_fact",
-                    confidence=0.8,
-                    source="sleep_consolidation",
-                    importance=0.7,
-                    tags=["human", "sleep_consolidation"]
-                )
-                stored["semantic"] += 1
-                logger.info(f"[Sleep-Webhook] Stored semantic: {update[:40]}...")
+        # 2. Semantic memories from human_updates (facts about human)
+        for update in data.human_updates[:3]:
+            semantic.append(SemanticMemoryBlock(
+                title=f"Human info: {update[:30]}",
+                content=update,
+                concept_category="human_fact",
+                confidence=0.8,
+                source="sleep_consolidation",
+                importance=0.7,
+                tags=["human", "sleep_consolidation"]
+            ))
+            logger.debug(f"[Sleep-Webhook] Prepared semantic: {update[:40]}...")
         
-        # 3. Store persona updates as semantic (knowledge about self)
-        persona_updates = insights.get("persona_updates", [])
-        for update in persona_updates[:2]:
-            if update and isinstance(update, str) and len(update) > 10:
-                mem_manager.create_semantic_memory(
-                    title=f"Self-knowledge: {update[:30]}",
-                    content=update,
-                    concept_category="self_knowledge",
-                    confidence=0.75,
-                    source="sleep_consolidation",
-                    importance=0.6,
-                    tags=["persona", "self", "sleep_consolidation"]
-                )
-                stored["semantic"] += 1
+        # 3. Persona updates as semantic (knowledge about self)
+        for update in data.persona_updates[:2]:
+            semantic.append(SemanticMemoryBlock(
+                title=f"Self-knowledge: {update[:30]}",
+                content=update,
+                concept_category="self_knowledge",
+                confidence=0.75,
+                source="sleep_consolidation",
+                importance=0.6,
+                tags=["persona", "self", "sleep_consolidation"]
+            ))
         
-        # 4. Store goals insights as procedural (what to work on)
-        goals_insights = insights.get("goals_insights", [])
-        for goal in goals_insights[:2]:
-            if goal and isinstance(goal, str) and len(goal) > 10:
-                mem_manager.create_procedural_memory(
-                    skill_name=f"Goal: {goal[:30]}",
-                    content=goal,
-                    procedure_type="goal_tracking",
-                    importance=0.7,
-                    tags=["goal", "sleep_consolidation"]
-                )
-                stored["procedural"] += 1
-                logger.info(f"[Sleep-Webhook] Stored procedural: {goal[:40]}...")
+        # 4. Goals insights as procedural (what to work on)
+        for goal in data.goals_insights[:2]:
+            procedural.append(ProceduralMemoryBlock(
+                skill_name=f"Goal: {goal[:30]}",
+                content=goal,
+                procedure_type="goal_tracking",
+                importance=0.7,
+                tags=["goal", "sleep_consolidation"]
+            ))
+            logger.debug(f"[Sleep-Webhook] Prepared procedural: {goal[:40]}...")
         
-        # 5. Store emotional patterns
-        reflection = insights.get("reflection", "")
+        # 5. Emotional patterns
+        reflection = data.reflection
         if reflection and len(reflection) > 20:
             # Detect basic emotion from reflection
-            emotion = "neutral"
-            if any(w in reflection.lower() for w in ["curioso", "interessato", "curious"]):
-                emotion = "curiosity"
-            elif any(w in reflection.lower() for w in ["positivo", "soddisfatto", "bene"]):
-                emotion = "satisfaction"
-            elif any(w in reflection.lower() for w in ["difficile", "problema", "frustrato"]):
-                emotion = "challenge"
+            emotion = next(
+                (name for name, pattern in EMOTION_PATTERNS if pattern.search(reflection)),
+                "neutral"
+            )
             
-            mem_manager.create_emotional_memory(
+            emotional.append(EmotionalMemoryBlock(
                 trigger="sleep_consolidation",
                 content=reflection,
                 response_type=emotion,
-                intensity=insights.get("priority_score", 0.5),
+                intensity=data.priority_score,
                 context_pattern="post_conversation_reflection",
                 importance=0.5,
-            )
-            stored["emotional"] = 1
-            logger.info(f"[Sleep-Webhook] Stored emotional: {emotion}")
+            ))
+            logger.debug(f"[Sleep-Webhook] Prepared emotional: {emotion}")
+        
+        # One upsert per collection; counts only what Qdrant accepted
+        stored.update(mem_manager.store_memories(episodic + semantic + procedural + emotional))
         
         logger.info(f"[Sleep-Webhook] Total stored: {stored}")
         return stored
@@ -651,141 +1127,140 @@ def store_insights_to_qdrant(
         return stored
 
 
+def _role_label(role: str) -> str:
+    """Uppercase transcript label for a message role."""
+    return ROLE_LABELS.get(role) or role.upper()
+
+
 async def trigger_sleep_consolidation(agent_id: str, conversation_id: str):
     """Trigger sleep agent consolidation and store insights in Qdrant."""
     logger.info(f"[Sleep-Webhook] Triggering consolidation for agent {agent_id}")
     
     try:
+        # Connect the MemoryManager to Qdrant while Letta serves the history
+        memory_ready = asyncio.create_task(asyncio.to_thread(get_memory_manager))
+        
         # Get conversation history from Letta
         # NOTE: Use follow_redirects=True to handle 307 redirects from Letta
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            # Get messages (NO trailing slash - causes 307 redirect!)
-            messages_response = await client.get(
-                f"{LETTA_URL}/v1/agents/{agent_id}/messages",
-                params={"limit": 100},
-                timeout=30.0
-            )
-            messages_response.raise_for_status()
-            messages = messages_response.json()
-            
-            if isinstance(messages, list):
-                # Build conversation history
-                history_parts = []
-                for msg in messages[-50:]:  # Last 50 messages
-                    role = msg.get("role", "unknown")
-                    content = msg.get("content", msg.get("assistant_message", ""))
-                    if content:
-                        history_parts.append(f"{role.upper()}: {content}")
-                conversation_history = "\n\n".join(history_parts[-20:])  # Last 20 turns
-            else:
-                conversation_history = str(messages)
-            
-            if not conversation_history.strip():
-                logger.info("[Sleep-Webhook] No conversation history to consolidate")
-                return
-            
-            # Build consolidation prompt
-            prompt = f"""Sei Scarlet-Sleep, un agente specializzato per il consolidamento della memoria.
-
-ANALISI: Analizza la cronologia e genera insights JSON strutturati.
-
-CRONOLOGIA:
-{conversation_history}
-
-OUTPUT JSON:
-{{
-    "persona_updates": ["insight su Scarlet"],
-    "human_updates": ["info sull umano"],
-    "goals_insights": ["progressi verso obiettivi"],
-    "key_events": [{{"description": "evento significativo", "importance": 0.8}}],
-    "reflection": "sintesi dei pattern emersi",
-    "priority_score": 0.7
-}}
-
-REGOLE: Non inventare info. Solo JSON, no markdown. Sii specifico e conciso."""
-
-            # Call sleep agent (NO trailing slash!)
-            sleep_response = await client.post(
-                f"{LETTA_URL}/v1/agents/{SLEEP_AGENT_ID}/messages",
-                json={"messages": [{"role": "user", "content": prompt}]},
-                timeout=120.0
+        client = get_letta_client()
+        # Get messages (NO trailing slash - causes 307 redirect!)
+        # Only the newest HISTORY_LIMIT conversation messages, newest first
+        messages_response = await client.get(
+            f"/v1/agents/{agent_id}/messages",
+            params={
+                "limit": HISTORY_LIMIT,
+                "order": "desc",
+                "include_return_message_types": ["user_message", "assistant_message"],
+            },
+            timeout=30.0
+        )
+        messages_response.raise_for_status()
+        messages = _json_loads(messages_response.content)
+        
+        if isinstance(messages, list):
+            # Build conversation history in chronological order
+            conversation_history = "\n\n".join(
+                f"{_role_label(msg.get('role', 'unknown'))}: {content}"
+                for msg in reversed(messages)
+                if (content := msg.get("content") or msg.get("assistant_message"))
             )
-            sleep_response.raise_for_status()
-            
-            logger.info(f"[Sleep-Webhook] Sleep agent responded for agent {agent_id}")
-            
-            # Parse sleep agent response
-            response_data = sleep_response.json()
-            assistant_message = ""
-            
-            # Debug: log response structure
-            logger.info(f"[Sleep-Webhook] Response type: {type(response_data)}")
-            if isinstance(response_data, dict):
-                logger.info(f"[Sleep-Webhook] Response keys: {list(response_data.keys())}")
-                if "messages" in response_data:
-                    for i, msg in enumerate(response_data["messages"][:5]):
-                        if isinstance(msg, dict):
-                            logger.info(f"[Sleep-Webhook] Message[{i}] type: {msg.get('message_type')} keys: {list(msg.keys())}")
+        else:
+            conversation_history = str(messages)
+        
+        if not conversation_history.strip():
+            logger.info("[Sleep-Webhook] No conversation history to consolidate")
+            return
+        
+        # Build consolidation prompt
+        prompt = PROMPT_PREFIX + conversation_history + PROMPT_SUFFIX
+
+        # Call sleep agent (NO trailing slash!)
+        sleep_response = await client.post(
+            f"/v1/agents/{SLEEP_AGENT_ID}/messages",
+            content=_json_dumps({"messages": [{"role": "user", "content": prompt}]}),
+            headers=JSON_HEADERS,
+            timeout=120.0
+        )
+        sleep_response.raise_for_status()
+        
+        logger.info(f"[Sleep-Webhook] Sleep agent responded for agent {agent_id}")
+        
+        # Parse sleep agent response (dict with "messages" or a bare list)
+        try:
+            parsed = SLEEP_RESPONSE_ADAPTER.validate_json(sleep_response.content)
+        except ValidationError as e:
+            logger.warning(f"[Sleep-Webhook] Unexpected sleep agent response: {e}")
+            return
+        messages = parsed if isinstance(parsed, list) else parsed.messages
+        
+        # Debug: log response structure (skipped entirely unless DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[Sleep-Webhook] Response type: %s", type(parsed).__name__)
+            for i, msg in enumerate(messages[:5]):
+                logger.debug("[Sleep-Webhook] Message[%d] type: %s", i, msg.message_type)
+        
+        # Extract assistant message from response
+        assistant_message = extract_assistant_message(messages)
+        
+        if assistant_message:
+            logger.info(f"[Sleep-Webhook] Parsing insights from response ({len(assistant_message)} chars)")
             
-            # Extract assistant message from response - try multiple formats
-            if isinstance(response_data, dict) and "messages" in response_data:
-                for msg in response_data["messages"]:
-                    if isinstance(msg, dict):
-                        msg_type = msg.get("message_type", "")
-                        logger.debug(f"[Sleep-Webhook] Message type: {msg_type}")
-                        if msg_type == "assistant_message":
-                            # Try both 'content' and 'assistant_message' fields
-                            assistant_message = msg.get("content", "") or msg.get("assistant_message", "")
-                            if assistant_message:
-                                logger.info(f"[Sleep-Webhook] Found assistant message ({len(assistant_message)} chars)")
-                                break
-                        # Also check for internal_monologue which may contain the response
-                        elif msg_type == "internal_monologue":
-                            monologue = msg.get("internal_monologue", "") or msg.get("content", "")
-                            if "{" in monologue and "}" in monologue:
-                                assistant_message = monologue
-                                logger.info("[Sleep-Webhook] Found JSON in internal_monologue")
-                                break
-            elif isinstance(response_data, list):
-                for msg in response_data:
-                    if isinstance(msg, dict):
-                        msg_type = msg.get("message_type", "")
-                        if msg_type == "assistant_message":
-                            assistant_message = msg.get("content", "") or msg.get("assistant_message", "")
-                            break
-                        elif msg_type == "internal_monologue":
-                            monologue = msg.get("internal_monologue", "") or msg.get("content", "")
-                            if "{" in monologue and "}" in monologue:
-                                assistant_message = monologue
-                                break
+            # Parse JSON insights
+            insights = parse_sleep_agent_response(assistant_message)
             
-            if assistant_message:
-                logger.info(f"[Sleep-Webhook] Parsing insights from response ({len(assistant_message)} chars)")
-                
-                # Parse JSON insights
-                insights = parse_sleep_agent_response(assistant_message)
-                
-                if insights:
-                    # Store insights in Qdrant
-                    mem_manager = get_memory_manager()
-                    if mem_manager:
-                        stored = store_insights_to_qdrant(conversation_history, insights, mem_manager)
-                        logger.info(f"[Sleep-Webhook] Stored to Qdrant: {stored}")
-                    else:
-                        logger.warning("[Sleep-Webhook] MemoryManager not available, skipping Qdrant storage")
+            if insights:
+                # Store insights in Qdrant
+                mem_manager = await memory_ready
+                if mem_manager:
+                    # Embedding + Qdrant I/O is blocking: keep it off the event loop
+                    stored = await asyncio.to_thread(
+                        store_insights_to_qdrant, conversation_history, insights, mem_manager
+                    )
+                    logger.info(f"[Sleep-Webhook] Stored to Qdrant: {stored}")
                 else:
-                    logger.warning("[Sleep-Webhook] Could not parse insights JSON")
+                    logger.warning("[Sleep-Webhook] MemoryManager not available, skipping Qdrant storage")
             else:
-                logger.warning("[Sleep-Webhook] No assistant message in response")
-            
-            logger.info(f"[Sleep-Webhook] Consolidation complete for agent {agent_id}")
-            
-    except Exception as e:
-        logger.error(f"[Sleep-Webhook] Error during consolidation: {e}")
-            
+                logger.warning("[Sleep-Webhook] Could not parse insights JSON")
+        else:
+            logger.warning("[Sleep-Webhook] No assistant message in response")
+        
+        logger.info(f"[Sleep-Webhook] Consolidation complete for agent {agent_id}")
+        
     except Exception as e:
         logger.error(f"[Sleep-Webhook] Error during consolidation: {e}")
 
+async def _run_bounded(coro):
+    """Run a consolidation once a concurrency slot is free."""
+    global _consolidation_slots
+    if _consolidation_slots is None:
+        _consolidation_slots = asyncio.Semaphore(CONSOLIDATION_WORKERS)
+    async with _consolidation_slots:
+        await coro
+
+
+def schedule_consolidation(agent_id: str, conversation_id: str) -> bool:
+    """
+    Schedule a background consolidation with backpressure.
+    
+    At most CONSOLIDATION_WORKERS consolidations talk to Letta at once and
+    at most CONSOLIDATION_QUEUE_SIZE are pending; beyond that the trigger
+    is dropped and logged instead of piling up tasks under burst traffic.
+    
+    Returns:
+        True if the consolidation was scheduled.
+    """
+    coro = trigger_sleep_consolidation(agent_id, conversation_id)
+    if len(_consolidation_tasks) >= CONSOLIDATION_QUEUE_SIZE:
+        coro.close()
+        logger.warning(f"[Sleep-Webhook] Consolidation queue full, dropping trigger for {conversation_id}")
+        return False
+    
+    task = asyncio.create_task(_run_bounded(coro))
+    _consolidation_tasks.add(task)
+    task.add_done_callback(_consolidation_tasks.discard)
+    return True
+
+
 @app.post("/webhooks/step-complete")
 async def handle_step_complete(
     payload: StepCompletePayload,
@@ -804,15 +1279,15 @@ async def handle_step_complete(
     if WEBHOOK_KEY:
         if not authorization or not authorization.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing authorization")
-        token = authorization.replace("Bearer ", "")
-        if token != WEBHOOK_KEY:
+        token = authorization.removeprefix("Bearer ").encode()
+        if not hmac.compare_digest(token, WEBHOOK_KEY_BYTES):
             raise HTTPException(status_code=401, detail="Invalid authorization")
     
     step_id = payload.step_id
     agent_id = payload.agent_id or PRIMARY_AGENT_ID  # Default to primary agent
     conversation_id = payload.conversation_id or agent_id  # Use agent_id as conversation identifier
     
-    logger.info(f"[Sleep-Webhook] Step {step_id} completed for agent {agent_id}")
+    logger.debug("[Sleep-Webhook] Step %s completed for agent %s", step_id, agent_id)
     
     # ===========================================================
     # AUTOMATIC MEMORY RETRIEVAL (every message)
@@ -832,21 +1307,18 @@ async def handle_step_complete(
     # ===========================================================
     # MESSAGE COUNTING & SLEEP CONSOLIDATION
     # ===========================================================
-    # Count this message
-    conversation_counters[conversation_id] = conversation_counters.get(conversation_id, 0) + 1
-    count = conversation_counters[conversation_id]
+    # Count this message (counter is reset when the threshold is reached)
+    count, should_consolidate = await count_step(conversation_id)
     
-    logger.info(f"[Sleep-Webhook] Message {count}/{SLEEP_THRESHOLD} for conversation {conversation_id}")
+    logger.debug("[Sleep-Webhook] Message %d/%d for conversation %s", count, SLEEP_THRESHOLD, conversation_id)
     
     # Check if we should trigger consolidation
-    if count >= SLEEP_THRESHOLD:
+    if should_consolidate:
         logger.info(f"[Sleep-Webhook] Threshold reached ({count}), triggering consolidation")
         
-        # Trigger consolidation asynchronously
-        asyncio.create_task(trigger_sleep_consolidation(agent_id, conversation_id))
+        # Trigger consolidation asynchronously (bounded, see schedule_consolidation)
+        schedule_consolidation(agent_id, conversation_id)
         
-        # Reset counter
-        conversation_counters[conversation_id] = 0
         last_consolidation[conversation_id] = datetime.now().isoformat()
     
     return {
@@ -864,6 +1336,7 @@ async def health_check():
 @app.get("/status")
 async def get_status():
     """Get current status of all conversations."""
+    conversation_counters.purge()
     return {
         "conversations": {
             k: {
@@ -888,6 +1361,11 @@ async def get_status():
 async def reset_counter(conversation_id: str):
     """Reset message counter for a conversation."""
     conversation_counters[conversation_id] = 0
+    if _redis is not None:
+        try:
+            await _redis.delete(f"sleep:cnt:{conversation_id}")
+        except Exception as e:
+            logger.warning(f"[Sleep-Webhook] Could not reset Redis counter: {e}")
     return {"status": "reset", "conversation_id": conversation_id}
 
 
@@ -1041,7 +1519,20 @@ async def decay_background_task():
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks on app startup."""
-    global _decay_task
+    global _decay_task, _redis, _qdrant
+    
+    if REDIS_HOST and REDIS_AVAILABLE:
+        _redis = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        logger.info(f"[Sleep-Webhook] Shared counters in Redis at {REDIS_HOST}:{REDIS_PORT}")
+    
+    if QDRANT_PREFER_GRPC and QDRANT_CLIENT_AVAILABLE:
+        _qdrant = AsyncQdrantClient(
+            host=QDRANT_HOST,
+            port=QDRANT_PORT,
+            grpc_port=QDRANT_GRPC_PORT,
+            prefer_grpc=True,
+        )
+        logger.info(f"[Sleep-Webhook] Qdrant searches over gRPC at {QDRANT_HOST}:{QDRANT_GRPC_PORT}")
     
     if DECAY_AVAILABLE:
         _decay_task = asyncio.create_task(decay_background_task())
@@ -1051,7 +1542,19 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cancel background tasks on shutdown."""
-    global _decay_task
+    global _decay_task, _redis, _qdrant
+    
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+    
+    if _qdrant is not None:
+        await _qdrant.close()
+        _qdrant = None
+    
+    for client in _http_clients.values():
+        await client.aclose()
+    _http_clients.clear()
     
     if _decay_task:
         _decay_task.cancel()
@@ -1070,6 +1573,7 @@ def main():
     logger.info(f"Letta URL: {LETTA_URL}")
     logger.info(f"Sleep Threshold: {SLEEP_THRESHOLD} messages")
     logger.info(f"Webhook Port: {SLEEP_WEBHOOK_PORT}")
+    logger.info(f"Workers: {WEBHOOK_WORKERS}")
     logger.info(f"Primary Agent: {PRIMARY_AGENT_ID}")
     logger.info(f"Sleep Agent: {SLEEP_AGENT_ID}")
     logger.info("-" * 60)
@@ -1085,8 +1589,18 @@ def main():
     logger.info(f"  Interval: {DECAY_INTERVAL_HOURS} hours")
     logger.info("=" * 60)
     
+    if WEBHOOK_WORKERS > 1 and not REDIS_HOST:
+        logger.warning("WEBHOOK_WORKERS > 1 without REDIS_HOST: message counters are per worker")
+    
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=SLEEP_WEBHOOK_PORT)
+    # loop="auto" already picks uvloop/httptools when installed (uvicorn[standard]);
+    # every step is logged by the handler, so the access log is redundant
+    if WEBHOOK_WORKERS > 1:
+        # Multiple workers need the app as an import string
+        uvicorn.run("sleep_webhook:app", host="0.0.0.0", port=SLEEP_WEBHOOK_PORT,
+                    workers=WEBHOOK_WORKERS, access_log=False)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=SLEEP_WEBHOOK_PORT, access_log=False)
 
 if __name__ == "__main__":
     main()
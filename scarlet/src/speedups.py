@@ -0,0 +1,31 @@
+"""
+Optional speedups shared by the Scarlet services.
+
+Detects the optional accelerator packages once, so every module gets the
+same fallbacks:
+- orjson: faster JSON parsing/serialization (orjson.JSONDecodeError
+  subclasses json.JSONDecodeError, so error handling is unchanged)
+- h2: enables HTTP/2 on httpx clients
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    ORJSON_AVAILABLE = False
+    json_loads = json.loads
+    
+    def json_dumps(obj: Any) -> bytes:
+        """Serialize obj to UTF-8 JSON bytes (same result type as orjson)."""
+        return json.dumps(obj).encode("utf-8")
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
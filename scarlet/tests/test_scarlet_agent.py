@@ -0,0 +1,384 @@
+"""
+Test suite for the Scarlet agent wrappers
+
+Unit tests for the sleep-time agent and orchestrator that run without a
+Letta server: the Letta client is replaced by in-memory fakes.
+
+Run: python -m tests.test_scarlet_agent
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+
+# Add parent directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scarlet_agent import (
+    ScarletAgent,
+    ScarletAgentPool,
+    ScarletSleepAgent,
+    SleepAgentConfig,
+    SleepTimeOrchestrator,
+)
+
+
+INSIGHTS_JSON = (
+    '{"persona_updates": ["Scarlet ama la filosofia"], '
+    '"human_updates": ["L\'umano programma in Python"], '
+    '"goals_insights": ["Capire la propria natura"], '
+    '"reflection": "Sessione su identità"}'
+)
+
+
+class FakePage:
+    """SDK page stand-in: iterating it fetches the following pages, like SyncArrayPage."""
+    
+    def __init__(self, api, items, next_after, **params):
+        self.items = items
+        self._api = api
+        self._next_after = next_after
+        self._params = params
+    
+    def __iter__(self):
+        page = self
+        while True:
+            yield from page.items
+            if not page.items or page._next_after is None:
+                return
+            page = page._api.list(after=page._next_after, **page._params)
+
+
+class FakeMessages:
+    """agents.messages stand-in: canned sleep replies, stored history."""
+    
+    def __init__(self, history=None):
+        self.history = history or []
+        self.created = 0
+        self.listed = []
+    
+    def create(self, agent_id, messages):
+        self.created += 1
+        return SimpleNamespace(messages=[SimpleNamespace(content=INSIGHTS_JSON)])
+    
+    def list(self, agent_id, limit, after=None, order="asc", **kwargs):
+        self.listed.append(after)
+        ordered = self.history[::-1] if order == "desc" else self.history
+        start = 0
+        if after is not None:
+            start = [m.id for m in ordered].index(after) + 1
+        elif order == "asc":
+            start = max(0, len(ordered) - limit)
+        items = ordered[start:start + limit]
+        next_after = items[-1].id if start + limit < len(ordered) else None
+        return FakePage(self, items, next_after, agent_id=agent_id, limit=limit, order=order, **kwargs)
+
+
+def make_sleep_agent(messages, min_new_words=0):
+    """Sleep agent whose every history embeds to the same vector."""
+    client = SimpleNamespace(agents=SimpleNamespace(messages=messages))
+    sleep = ScarletSleepAgent(
+        client,
+        SleepAgentConfig(min_new_words=min_new_words),
+        embed_fn=lambda text: [1.0, 0.0, 0.0],
+    )
+    sleep._agent_id = "sleep-agent"
+    return sleep
+
+
+class TestSemanticCache:
+    """Near-identical histories must not replay stored insights."""
+    
+    def test_cache_hit_returns_no_updates(self):
+        """A cache hit skips the LLM and carries no block updates."""
+        messages = FakeMessages()
+        sleep = make_sleep_agent(messages)
+        
+        first = sleep.consolidate("USER: ciao\n\nASSISTANT: ciao a te")
+        assert first["persona_updates"]
+        assert not first.get("cached")
+        
+        second = sleep.consolidate("USER: ciao!\n\nASSISTANT: ciao a te!")
+        assert messages.created == 1
+        assert second["cached"] is True
+        assert not second["persona_updates"]
+        assert not second["human_updates"]
+        assert not second["goals_insights"]
+    
+    def test_cache_hit_is_not_applied_or_stored(self):
+        """The orchestrator skips apply and store on a cache hit."""
+        messages = FakeMessages()
+        sleep = make_sleep_agent(messages)
+        primary = SimpleNamespace(
+            _client=SimpleNamespace(agents=SimpleNamespace(messages=messages)),
+            _agent_id="primary-agent",
+            is_created=True,
+            memory_manager=None,
+        )
+        
+        applied, stored = [], []
+        
+        class Orchestrator(SleepTimeOrchestrator):
+            __slots__ = ()
+            
+            def _apply_insights(self, persona, human, goals, now_iso=None):
+                applied.append(list(persona))
+            
+            def _store_consolidated_memories(self, history, insights):
+                stored.append(insights)
+        
+        orchestrator = Orchestrator(primary, sleep)
+        try:
+            messages.history = [SimpleNamespace(id="m1", message_type="user_message", content="ciao")]
+            assert orchestrator.run_consolidation()["persona_updates"]
+            
+            messages.history.append(
+                SimpleNamespace(id="m2", message_type="assistant_message", content="ciao a te")
+            )
+            assert orchestrator.run_consolidation()["cached"] is True
+        finally:
+            orchestrator.shutdown()
+        
+        assert applied == [["Scarlet ama la filosofia"]]
+        assert len(stored) == 1
+        assert orchestrator.get_status()["consolidation_count"] == 2
+
+    
+    def test_parsed_insights_are_not_shared(self):
+        """Mutating a parsed result does not leak into the next identical reply."""
+        sleep = make_sleep_agent(FakeMessages())
+        first = sleep._parse_insights(INSIGHTS_JSON)
+        first["persona_updates"].append("modificato")
+        first["cached"] = True
+        
+        second = sleep._parse_insights(INSIGHTS_JSON)
+        assert second["persona_updates"] == ["Scarlet ama la filosofia"]
+        assert "cached" not in second
+
+
+class TestTrivialDelta:
+    """Cycles with too little new text."""
+    
+    def test_trivial_delta_is_not_stored(self):
+        """A skipped cycle does not store the old history again."""
+        messages = FakeMessages()
+        sleep = make_sleep_agent(messages, min_new_words=5)
+        manager = MagicMock()
+        primary = SimpleNamespace(
+            _client=SimpleNamespace(agents=SimpleNamespace(messages=messages)),
+            _agent_id="primary-agent",
+            is_created=True,
+            memory_manager=manager,
+        )
+        
+        class Orchestrator(SleepTimeOrchestrator):
+            __slots__ = ()
+            
+            def _apply_insights(self, persona, human, goals, now_iso=None):
+                pass
+        
+        orchestrator = Orchestrator(primary, sleep)
+        try:
+            messages.history = [
+                SimpleNamespace(id="m1", message_type="user_message", content="parliamo di filosofia antica"),
+                SimpleNamespace(id="m2", message_type="assistant_message", content="volentieri, da dove partiamo"),
+            ]
+            orchestrator.run_consolidation()
+            assert manager.create_episodic_memory.call_count == 1
+            
+            messages.history.append(
+                SimpleNamespace(id="m3", message_type="user_message", content="ok")
+            )
+            assert orchestrator.run_consolidation()["skipped"] is True
+        finally:
+            orchestrator.shutdown()
+        
+        assert manager.create_episodic_memory.call_count == 1
+
+
+class TestMessageCount:
+    """Counting across a consolidation cycle."""
+    
+    def test_messages_during_cycle_are_kept(self):
+        """Messages counted while a cycle runs count toward the next one."""
+        primary = SimpleNamespace(
+            _client=SimpleNamespace(agents=SimpleNamespace(messages=FakeMessages())),
+            _agent_id="primary-agent",
+            is_created=True,
+            memory_manager=None,
+        )
+        sleep = SimpleNamespace(is_created=True, _agent_id="sleep-agent")
+        orchestrator = SleepTimeOrchestrator(primary, sleep, message_threshold=5, max_wait=0)
+        
+        def consolidate(history):
+            orchestrator.on_message(2)
+            return {"reflection": "ok"}
+        
+        sleep.consolidate = consolidate
+        try:
+            orchestrator.message_count = 5
+            orchestrator.run_consolidation()
+        finally:
+            orchestrator.shutdown()
+        
+        assert orchestrator.message_count == 2
+
+
+class TestMessageCursor:
+    """Incremental message fetch."""
+    
+    @staticmethod
+    def message(i):
+        role = "user_message" if i % 2 == 0 else "assistant_message"
+        return SimpleNamespace(id=f"m{i}", message_type=role, content=f"testo {i}")
+    
+    def test_backlog_over_a_page_reads_newest(self):
+        """More new messages than a page: read the newest, cursor on the newest id."""
+        messages = FakeMessages([self.message(i) for i in range(4)])
+        primary = SimpleNamespace(
+            _client=SimpleNamespace(agents=SimpleNamespace(messages=messages)),
+            _agent_id="primary-agent",
+            is_created=True,
+        )
+        
+        class Orchestrator(SleepTimeOrchestrator):
+            __slots__ = ()
+            FETCH_LIMIT = 4
+            RECENT_TURNS = 1
+        
+        orchestrator = Orchestrator(primary, SimpleNamespace(is_created=True))
+        try:
+            assert orchestrator._get_recent_messages() == "USER: testo 2\n\nASSISTANT: testo 3"
+            assert orchestrator._last_seen_message_id == "m3"
+            
+            # Two new messages fit in a page: cursor fetch only
+            messages.history += [self.message(i) for i in range(4, 6)]
+            assert orchestrator._get_recent_messages() == "USER: testo 4\n\nASSISTANT: testo 5"
+            assert messages.listed[-1] == "m3"
+            
+            # Ten new messages overflow the page: the newest page is read
+            messages.history += [self.message(i) for i in range(6, 16)]
+            assert orchestrator._get_recent_messages() == "USER: testo 14\n\nASSISTANT: testo 15"
+            assert orchestrator._last_seen_message_id == "m15"
+            assert messages.listed[-2:] == ["m5", None]
+            
+            # Each fetch reads one page, never the following ones
+            assert len(messages.listed) == 4
+        finally:
+            orchestrator.shutdown()
+
+
+class TestAgentPool:
+    """Pool checkout, return and per-agent sharing."""
+    
+    @staticmethod
+    def make_factory(agent_id="agent-1"):
+        created = []
+        
+        def factory():
+            wrapper = SimpleNamespace(
+                _agent_id=agent_id,
+                _sleep_agent=object(),
+                _orchestrator=MagicMock(),
+            )
+            created.append(wrapper)
+            return wrapper
+        
+        return factory, created
+    
+    def test_checkout_and_return_reuses_wrapper(self):
+        """A returned wrapper is handed out again instead of a new one."""
+        factory, created = self.make_factory()
+        pool = ScarletAgentPool(factory, max_size=2)
+        
+        with pool.agent() as first:
+            pass
+        with pool.agent() as second:
+            pass
+        
+        assert first is second
+        assert len(created) == 1
+    
+    def test_wrappers_of_one_agent_share_orchestrator(self):
+        """Wrappers of the same Letta agent share counter and orchestrator."""
+        factory, created = self.make_factory()
+        pool = ScarletAgentPool(factory, max_size=2)
+        first = pool._adopt(factory())
+        second = pool._adopt(factory())
+        
+        assert second._orchestrator is first._orchestrator
+        assert second._sleep_agent is first._sleep_agent
+        created[1]._orchestrator.shutdown.assert_not_called()
+        
+        # Only the last wrapper of the agent shuts the orchestrator down
+        pool._discard(first)
+        first._orchestrator.shutdown.assert_not_called()
+        pool._discard(second)
+        first._orchestrator.shutdown.assert_called_once_with(wait=False)
+    
+    def test_block_change_invalidates_every_wrapper(self):
+        """Consolidation through one wrapper drops the other's cached blocks."""
+        factory, _ = self.make_factory()
+        pool = ScarletAgentPool(factory, max_size=2)
+        first = pool._adopt(factory())
+        second = pool._adopt(factory())
+        first._blocks_cache = second._blocks_cache = (time.monotonic(), {})
+        
+        ScarletAgent._invalidate_blocks_cache(first)
+        assert first._blocks_cache is None
+        assert second._blocks_cache is None
+        
+        # A discarded wrapper no longer follows the others
+        pool._discard(first)
+        first._blocks_cache = (time.monotonic(), {})
+        ScarletAgent._invalidate_blocks_cache(second)
+        assert first._blocks_cache is not None
+    
+    def test_same_agent_borrowers_are_serialized(self):
+        """Two borrowers of one Letta agent never chat at the same time."""
+        factory, _ = self.make_factory()
+        pool = ScarletAgentPool(factory, max_size=2)
+        active, overlap = [], []
+        
+        def borrow():
+            with pool.agent():
+                active.append(1)
+                overlap.append(len(active))
+                time.sleep(0.05)
+                active.pop()
+        
+        threads = [threading.Thread(target=borrow) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert overlap == [1, 1]
+    
+    def test_close_drops_idle_agents(self):
+        """close() releases idle wrappers and their orchestrator."""
+        factory, created = self.make_factory()
+        pool = ScarletAgentPool(factory, max_size=1)
+        with pool.agent():
+            pass
+        
+        pool.close()
+        created[0]._orchestrator.shutdown.assert_called_once_with(wait=False)
+        assert not pool._shared
+
+
+def run_tests():
+    """Run all tests and return results."""
+    pytest.main([__file__, "-v", "--tb=short"])
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Scarlet Agent Tests")
+    print("=" * 60)
+    run_tests()
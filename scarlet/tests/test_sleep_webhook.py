@@ -8,6 +8,7 @@ Run: python -m tests.test_sleep_webhook
 """
 
 import sys
+import time
 from pathlib import Path
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -18,7 +19,17 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from fastapi.testclient import TestClient
-from sleep_webhook import app, conversation_counters, StepCompletePayload
+from sleep_webhook import (
+    app,
+    conversation_counters,
+    count_step,
+    ExpiringDict,
+    StepCompletePayload,
+    SleepInsights,
+    generate_embedding,
+    search_qdrant_collection,
+    store_insights_to_qdrant,
+)
 
 client = TestClient(app)
 
@@ -216,6 +227,155 @@ class TestConversationIsolation:
         assert conversation_counters.get("conv-B") == 2
 
 
+class TestExpiringDict:
+    """Test the TTL-bounded state dict."""
+    
+    def test_expired_key_is_dropped_on_read(self):
+        """get, [] and in never return an entry older than the TTL."""
+        state = ExpiringDict(maxsize=10, ttl=0.05)
+        state["agent"] = "value"
+        assert state.get("agent") == "value"
+        assert "agent" in state
+        
+        time.sleep(0.06)
+        assert state.get("agent") is None
+        assert "agent" not in state
+        with pytest.raises(KeyError):
+            state["agent"]
+        assert len(state) == 0
+    
+    def test_rewrite_renews_ttl(self):
+        """Writing a key again restarts its TTL."""
+        state = ExpiringDict(maxsize=10, ttl=0.1)
+        state["agent"] = 1
+        time.sleep(0.06)
+        state["agent"] = 2
+        time.sleep(0.06)
+        assert state.get("agent") == 2
+    
+    def test_maxsize_evicts_oldest(self):
+        """Beyond maxsize the least recently written keys are dropped."""
+        state = ExpiringDict(maxsize=2, ttl=60)
+        for key in ("a", "b", "c"):
+            state[key] = key
+        assert list(state) == ["b", "c"]
+
+    
+    def test_embedding_hit_keeps_write_order(self):
+        """A cache hit neither calls Ollama again nor hides older entries from expiry."""
+        import asyncio
+        ollama = MagicMock()
+        ollama.post = AsyncMock(return_value=httpx.Response(
+            200, json={"embedding": [0.1, 0.2]},
+            request=httpx.Request("POST", "http://ollama/api/embeddings")
+        ))
+        cache = ExpiringDict(maxsize=10, ttl=60)
+        with patch("sleep_webhook._embedding_cache", cache), \
+                patch("sleep_webhook.get_http_client", return_value=ollama):
+            asyncio.run(generate_embedding("Ciao Scarlet"))
+            asyncio.run(generate_embedding("altro messaggio"))
+            assert asyncio.run(generate_embedding("  ciao scarlet ")) == [0.1, 0.2]
+            
+            assert ollama.post.await_count == 2
+            first = next(iter(cache))
+            cache._written[first] -= 120
+            cache.purge()
+            assert len(cache) == 1
+
+
+class TestSleepInsights:
+    """Test validation of sleep agent insights."""
+    
+    BAD_NUMBERS = {
+        "key_events": [
+            {"description": "Prima conversazione sulla memoria", "importance": "high"},
+            {"description": "L'umano ha spiegato il progetto", "importance": 0.9},
+        ],
+        "human_updates": ["L'umano lavora nello sviluppo software"],
+        "reflection": "Sessione focalizzata su identità e memoria",
+        "priority_score": "alta",
+    }
+    
+    def test_bad_numbers_fall_back_to_default(self):
+        """Non-numeric scores become 0.5 instead of failing validation."""
+        data = SleepInsights.model_validate(self.BAD_NUMBERS)
+        assert [e.importance for e in data.key_events] == [0.5, 0.9]
+        assert data.priority_score == 0.5
+        assert len(data.human_updates) == 1
+    
+    def test_bad_numbers_store_every_valid_item(self):
+        """One malformed field does not drop the rest of the payload."""
+        manager = MagicMock()
+        manager.store_memories.side_effect = lambda memories: {
+            t: sum(m.memory_type.value == t for m in memories)
+            for t in ("episodic", "semantic", "emotional")
+        }
+        stored = store_insights_to_qdrant("", self.BAD_NUMBERS, manager)
+        assert stored == {"episodic": 2, "semantic": 1, "procedural": 0, "emotional": 1}
+        manager.store_memories.assert_called_once()
+        assert len(manager.store_memories.call_args.args[0]) == 4
+    
+    def test_failed_upsert_is_not_counted(self):
+        """Counts come from what Qdrant accepted, not from the input lists."""
+        manager = MagicMock()
+        manager.store_memories.return_value = {"episodic": 0, "semantic": 1, "emotional": 1}
+        stored = store_insights_to_qdrant("", self.BAD_NUMBERS, manager)
+        assert stored == {"episodic": 0, "semantic": 1, "procedural": 0, "emotional": 1}
+
+
+class TestRedisCounter:
+    """Test the counter shared through Redis."""
+    
+    def test_claim_is_one_atomic_call(self):
+        """Increment, threshold check and reset run in a single EVAL."""
+        import asyncio
+        redis = MagicMock()
+        redis.eval = AsyncMock(side_effect=[[4, 0], [5, 1]])
+        with patch("sleep_webhook._redis", redis), patch("sleep_webhook.SLEEP_THRESHOLD", 5):
+            assert asyncio.run(count_step("conv-redis")) == (4, False)
+            assert conversation_counters["conv-redis"] == 4
+            assert asyncio.run(count_step("conv-redis")) == (5, True)
+            assert conversation_counters["conv-redis"] == 0
+        
+        assert redis.eval.await_count == 2
+        assert redis.eval.await_args.args[1:4] == (1, "sleep:cnt:conv-redis", 5)
+        redis.getdel.assert_not_called()
+
+
+class TestQdrantSearch:
+    """Test searches through the qdrant-client (gRPC) path."""
+    
+    @staticmethod
+    def search_with(error):
+        import asyncio
+        qdrant = MagicMock()
+        qdrant.query_points = AsyncMock(side_effect=error)
+        with patch("sleep_webhook._qdrant", qdrant), patch("sleep_webhook.logger") as log:
+            results = asyncio.run(search_qdrant_collection("missing", [0.1, 0.2]))
+        return results, log
+    
+    def test_grpc_not_found_is_empty_result(self):
+        """A missing collection over gRPC is an empty result, not an error."""
+        import grpc
+        error = grpc.aio.AioRpcError(
+            grpc.StatusCode.NOT_FOUND, grpc.aio.Metadata(), grpc.aio.Metadata(),
+            details="Collection missing not found"
+        )
+        results, log = self.search_with(error)
+        assert results == []
+        log.error.assert_not_called()
+    
+    def test_grpc_other_errors_are_logged(self):
+        """Other gRPC failures are still reported."""
+        import grpc
+        error = grpc.aio.AioRpcError(
+            grpc.StatusCode.UNAVAILABLE, grpc.aio.Metadata(), grpc.aio.Metadata()
+        )
+        results, log = self.search_with(error)
+        assert results == []
+        log.error.assert_called_once()
+
+
 def run_tests():
     """Run all tests and return results."""
     pytest.main([__file__, "-v", "--tb=short"])